@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Memory Benchmark
+Measures peak RSS, minor page faults (fresh large arrays are mmap'd and
+faulted in page by page), GC pauses and per-frame time of the
+capture/encode hot loop, comparing the legacy path (fresh cap.read() frame + frame.copy() +
+tobytes() + per-viewer multipart concatenation) against the FramePool path
+(decode into recycled arrays, draw in place, shared prebuilt part header).
+
+Each mode runs in its own process so peak RSS is not shared between them.
+
+Usage: python3 benchmark_memory.py [frames] [viewers] [WIDTHxHEIGHT]
+"""
+
+import gc
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+
+def make_clip(path, frames, size):
+    width, height = size
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 25, size)
+    rng = np.random.default_rng(0)
+    base = rng.integers(0, 255, (height, width, 3), dtype=np.uint8)
+    for i in range(frames):
+        frame = np.roll(base, i * 8, axis=1)
+        cv2.putText(frame, f"frame {i}", (40, height - 40), cv2.FONT_HERSHEY_SIMPLEX, 2, (255, 255, 255), 4)
+        writer.write(frame)
+    writer.release()
+
+
+def legacy_loop(cap, viewers):
+    ret, frame = cap.read()
+    if not ret:
+        return False
+    annotated = frame.copy()
+    cv2.putText(annotated, "FPS: 25.00", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
+    ret, buffer = cv2.imencode('.jpg', annotated, [int(cv2.IMWRITE_JPEG_QUALITY), 75])
+    frame_bytes = buffer.tobytes()
+    for _ in range(viewers):
+        chunk = (b'--frame\r\n'
+                 b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
+        del chunk
+    return True
+
+
+def pooled_loop(cap, viewers, pool):
+    from detecciones import MJPEG_PART_HEADER, MJPEG_PART_TRAILER
+
+    ret, frame = cap.read(pool.acquire())
+    if not ret:
+        return False
+    try:
+        cv2.putText(frame, "FPS: 25.00", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
+        ret, buffer = cv2.imencode('.jpg', frame, [int(cv2.IMWRITE_JPEG_QUALITY), 75])
+        jpeg = buffer.tobytes()
+        part = (MJPEG_PART_HEADER % len(jpeg), jpeg)
+        for _ in range(viewers):
+            header, image = part
+            for chunk in (header, image, MJPEG_PART_TRAILER):
+                pass
+    finally:
+        pool.release(frame)
+    return True
+
+
+def run_child(mode, path, frames, viewers):
+    """Run one mode and print its measurements as JSON"""
+    pauses = []
+    started = {}
+
+    def on_gc(phase, info):
+        if phase == 'start':
+            started['t'] = time.perf_counter()
+        elif 't' in started:
+            pauses.append(time.perf_counter() - started.pop('t'))
+
+    pool = None
+    if mode == 'pooled':
+        from detecciones import FramePool
+        pool = FramePool()
+
+    cap = cv2.VideoCapture(path)
+    usage_before = resource.getrusage(resource.RUSAGE_SELF)
+    gc.callbacks.append(on_gc)
+    start = time.perf_counter()
+    done = 0
+    while done < frames:
+        ok = legacy_loop(cap, viewers) if mode == 'legacy' else pooled_loop(cap, viewers, pool)
+        if not ok:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            continue
+        done += 1
+    elapsed = time.perf_counter() - start
+    gc.callbacks.remove(on_gc)
+    cap.release()
+
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    print(json.dumps({
+        'ms_per_frame': elapsed / frames * 1000,
+        'peak_rss_mb': usage.ru_maxrss / 1024,
+        'faults_per_frame': (usage.ru_minflt - usage_before.ru_minflt) / frames,
+        'gc_collections': len(pauses),
+        'gc_pause_total_ms': sum(pauses) * 1000,
+        'gc_pause_max_ms': max(pauses) * 1000 if pauses else 0,
+    }))
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == '--child':
+        run_child(sys.argv[2], sys.argv[3], int(sys.argv[4]), int(sys.argv[5]))
+        return
+
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 else 250
+    viewers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    width, height = (int(v) for v in (sys.argv[3] if len(sys.argv) > 3 else '1920x1080').split('x'))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'clip.avi')
+        make_clip(path, min(frames, 100), (width, height))
+
+        print(f"📊 {frames} frames @ {width}x{height}, {viewers} viewers")
+        print("=" * 78)
+        print(f"{'mode':<10}{'ms/frame':>10}{'peak RSS MB':>13}{'faults/frame':>14}{'GC runs':>9}{'GC total ms':>13}{'GC max ms':>11}")
+        env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(__file__)))
+        for mode in ('legacy', 'pooled'):
+            out = subprocess.run([sys.executable, __file__, '--child', mode, path, str(frames), str(viewers)],
+                                 capture_output=True, text=True, env=env, check=True).stdout
+            r = json.loads(out.strip().splitlines()[-1])
+            print(f"{mode:<10}{r['ms_per_frame']:>10.2f}{r['peak_rss_mb']:>13.1f}{r['faults_per_frame']:>14.0f}"
+                  f"{r['gc_collections']:>9}{r['gc_pause_total_ms']:>13.2f}{r['gc_pause_max_ms']:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
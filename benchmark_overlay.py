@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Overlay Benchmark
+Compares per-frame post-processing overhead of the legacy path
+(frame.copy() + per-box class filter + Results.plot() twice) against
+filter_detections() + OverlayRenderer drawing in place.
+
+Usage: python3 benchmark_overlay.py [frames] [boxes_per_model]
+"""
+
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from detecciones import (filter_detections, OverlayRenderer, COLOR_ARMS, COLOR_HELMET,
+                         TARGET_CLASSES_ARMS, TARGET_CLASSES_HELMETS)
+
+try:
+    import torch
+    from ultralytics.engine.results import Results
+    ULTRALYTICS_AVAILABLE = True
+except ImportError:
+    ULTRALYTICS_AVAILABLE = False
+
+NAMES = {0: "weapon", 1: "person", 2: "helmet", 3: "vest"}
+
+
+def make_detections(rng, n, width, height):
+    """Random (n, 6) [x1, y1, x2, y2, conf, cls] array"""
+    x1 = rng.uniform(0, width - 100, n)
+    y1 = rng.uniform(0, height - 100, n)
+    w = rng.uniform(20, 100, n)
+    h = rng.uniform(20, 100, n)
+    conf = rng.uniform(0.7, 1.0, n)
+    cls = rng.integers(0, len(NAMES), n)
+    return np.stack([x1, y1, x1 + w, y1 + h, conf, cls], axis=1).astype(np.float32)
+
+
+def legacy_path(frame, dets_a, dets_b):
+    annotated = frame.copy()
+    for dets, targets in ((dets_a, TARGET_CLASSES_ARMS), (dets_b, TARGET_CLASSES_HELMETS)):
+        if ULTRALYTICS_AVAILABLE:
+            result = Results(frame, path="", names=NAMES, boxes=torch.from_numpy(dets))
+            keep = [i for i, cls in enumerate(result.boxes.cls) if int(cls) in targets]
+            result.boxes = result.boxes[keep]
+            annotated = result.plot(img=annotated)
+        else:
+            # Without ultralytics: per-box Python filtering and uncached label measuring
+            keep = [row for row in dets if int(row[5]) in targets]
+            for x1, y1, x2, y2, conf, cls in keep:
+                text = f"{NAMES[int(cls)]} {conf:.2f}"
+                (w, h), _ = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 1)
+                cv2.rectangle(annotated, (int(x1), int(y1)), (int(x2), int(y2)), (0, 0, 255), 2)
+                cv2.rectangle(annotated, (int(x1), int(y1) - h), (int(x1) + w, int(y1)), (0, 0, 255), -1)
+                cv2.putText(annotated, text, (int(x1), int(y1)), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+    cv2.putText(annotated, "FPS: 25.00", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
+    cv2.putText(annotated, "Source: FILE", (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
+    return annotated
+
+
+def renderer_path(renderer, frame, dets_a, dets_b):
+    renderer.draw_detections(frame, filter_detections(dets_a, TARGET_CLASSES_ARMS), NAMES, COLOR_ARMS)
+    renderer.draw_detections(frame, filter_detections(dets_b, TARGET_CLASSES_HELMETS), NAMES, COLOR_HELMET)
+    renderer.draw_status(frame, 25.0, "FILE")
+    return frame
+
+
+def bench(label, fn, frames):
+    start = time.perf_counter()
+    for frame, dets_a, dets_b in frames:
+        fn(frame, dets_a, dets_b)
+    per_frame = (time.perf_counter() - start) / len(frames) * 1000
+    print(f"{label:<12} {per_frame:8.3f} ms/frame")
+    return per_frame
+
+
+def main():
+    n_frames = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    n_boxes = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    width, height = 1280, 720
+
+    rng = np.random.default_rng(0)
+    base = rng.integers(0, 255, (height, width, 3), dtype=np.uint8)
+    frames = [(base.copy(), make_detections(rng, n_boxes, width, height),
+               make_detections(rng, n_boxes, width, height)) for _ in range(n_frames)]
+
+    print(f"📊 {n_frames} frames @ {width}x{height}, {n_boxes} boxes per model "
+          f"(legacy plot: {'ultralytics' if ULTRALYTICS_AVAILABLE else 'emulated'})")
+    print("=" * 50)
+    legacy = bench("legacy", legacy_path, frames)
+    renderer = OverlayRenderer()
+    fast = bench("renderer", lambda f, a, b: renderer_path(renderer, f, a, b), frames)
+    print("=" * 50)
+    print(f"Speedup: {legacy / fast:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
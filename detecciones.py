@@ -5,66 +5,739 @@ Streams a local video file as if it were an RTSP/webcam stream
 Uses a file path instead of RTSP URL
 """
 
-import cv2
-try:
-    import torch
-    TORCH_AVAILABLE = True
-except ImportError:
-    TORCH_AVAILABLE = False
-    
-try:
-    from ultralytics import YOLO
-    YOLO_AVAILABLE = True
-except ImportError:
-    YOLO_AVAILABLE = False
-    
 import time
+_BOOT_START = time.perf_counter()
+
+import cv2
+import numpy as np
+import re
+import json
+import math
+import queue
+import collections
+import atexit
 import socket
 import struct
 import threading
-from flask import Flask, render_template, Response, request, jsonify
+import urllib.request
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 import os
 
-device = "cuda" if (TORCH_AVAILABLE and torch.cuda.is_available()) else "cpu"
+# Startup timing report (seconds since process boot, per phase)
+STARTUP_TIMINGS = {'imports': round(time.perf_counter() - _BOOT_START, 3)}
+
+# torch / ultralytics are heavy: they are only imported the first time a
+# detector is actually requested (see load_models)
+TORCH_AVAILABLE = None
+YOLO_AVAILABLE = None
+device = None
 
 # Modelos
 model_arms = None
 model_helmet = None
+MODEL_ARMS_PATH = os.environ.get('MODEL_ARMS_PATH', '')
+MODEL_HELMET_PATH = os.environ.get('MODEL_HELMET_PATH', '')
+_models_lock = threading.Lock()
+
+# Out-of-process inference (0 = run the models in this process)
+INFERENCE_WORKERS = int(os.environ.get('INFERENCE_WORKERS', 0))
+INFERENCE_SLOTS = int(os.environ.get('INFERENCE_SLOTS', 0)) or None
+INFERENCE_MAX_FRAME = os.environ.get('INFERENCE_MAX_FRAME', '1920x1080')
+inference_pool = None
 
-CONFIDENCE_THRESHOLD = 0.7
+# Cameras are addressed by name (?camera=<name>, /snapshot/<name>.jpg)
+DEFAULT_CAMERA = 'default'
+CAMERA_NAME_RE = re.compile(r'^[A-Za-z0-9_-]{1,32}$')
+MOSAIC_MAX_FPS = float(os.environ.get('MOSAIC_MAX_FPS', 2))
+MAX_CAMERAS = int(os.environ.get('MAX_CAMERAS', 16))
+
+# Pipeline defaults; each stream can override them at runtime via /config
+CONFIDENCE_THRESHOLD = float(os.environ.get('CONFIDENCE_THRESHOLD', 0.7))
 TARGET_CLASSES_ARMS = [0]
 TARGET_CLASSES_HELMETS = [0]
+INFERENCE_IMGSZ = 416
+JPEG_QUALITY = 75
+CAPTURE_BUFFER_SIZE = 3
+FRAME_SKIP = int(os.environ.get('FRAME_SKIP', 0))
+QOS_LATENCY_BUDGET_MS = int(os.environ.get('QOS_LATENCY_BUDGET_MS', 1000))
+CONFIG_PATH = os.environ.get('CONFIG_PATH', 'stream_config.json')
 
 app = Flask(__name__)
 CORS(app)
 
-class VideoStream:
+# Dashboard template, compiled once at import and served from memory
+_t0 = time.perf_counter()
+with open(os.path.join(app.root_path, 'templates', 'index.html'), encoding='utf-8') as f:
+    INDEX_TEMPLATE = app.jinja_env.from_string(f.read())
+INDEX_HTML = INDEX_TEMPLATE.render()
+STARTUP_TIMINGS['template'] = round(time.perf_counter() - _t0, 3)
+
+
+def detection_enabled():
+    if inference_pool is not None:
+        return inference_pool.healthy()
+    return model_arms is not None and model_helmet is not None
+
+
+def load_models():
+    """Import the ML stack and load the YOLO detectors on first use.
+
+    With INFERENCE_WORKERS > 0 the models are loaded by the worker processes
+    instead and this process never imports torch.
+
+    Returns (ok, message). Detection stays disabled (ok=True) when no model
+    paths are configured, which is the default.
+    """
+    global TORCH_AVAILABLE, YOLO_AVAILABLE, device, model_arms, model_helmet, inference_pool
+    with _models_lock:
+        if detection_enabled():
+            return True, "Models already loaded"
+        if not (MODEL_ARMS_PATH and MODEL_HELMET_PATH):
+            return True, "Models not configured"
+        if inference_pool is not None:
+            # A worker died: replace the whole pool
+            print("⚠️ Inference worker died - restarting the worker pool")
+            inference_pool.close()
+            inference_pool = None
+
+        t0 = time.perf_counter()
+        if INFERENCE_WORKERS > 0:
+            from inference_pool import InferencePool
+            width, height = INFERENCE_MAX_FRAME.lower().split('x')
+            try:
+                inference_pool = InferencePool(INFERENCE_WORKERS, (MODEL_ARMS_PATH, MODEL_HELMET_PATH),
+                                               slots=INFERENCE_SLOTS, max_frame_size=(int(width), int(height)))
+            except RuntimeError as e:
+                return False, str(e)
+            atexit.register(inference_pool.close)
+            STARTUP_TIMINGS['models'] = round(time.perf_counter() - t0, 3)
+            print(f"🧠 Started {INFERENCE_WORKERS} inference workers ({inference_pool.slots} frame slots)")
+            return True, "Inference workers started"
+
+        try:
+            import torch
+            TORCH_AVAILABLE = True
+        except ImportError:
+            TORCH_AVAILABLE = False
+        try:
+            from ultralytics import YOLO
+            YOLO_AVAILABLE = True
+        except ImportError:
+            YOLO_AVAILABLE = False
+            return False, "ultralytics is not installed"
+
+        device = "cuda" if (TORCH_AVAILABLE and torch.cuda.is_available()) else "cpu"
+        model_arms = YOLO(MODEL_ARMS_PATH).to(device)
+        model_helmet = YOLO(MODEL_HELMET_PATH).to(device)
+        STARTUP_TIMINGS['models'] = round(time.perf_counter() - t0, 3)
+        print(f"🧠 Models loaded on {device} in {STARTUP_TIMINGS['models']}s")
+        return True, "Models loaded"
+
+
+def filter_detections(data, target_classes):
+    """Return the (N, 6) [x1, y1, x2, y2, conf, cls] rows of a Boxes.data array/tensor
+    whose class is in target_classes.
+
+    Filtering is a single vectorized mask over the box array - no per-box Python loop.
+    """
+    if hasattr(data, 'cpu'):
+        data = data.cpu().numpy()
+    if len(data) == 0:
+        return np.empty((0, 6), dtype=np.float32)
+    data = data[:, [0, 1, 2, 3, -2, -1]]
+    mask = np.isin(data[:, 5].astype(np.int64), target_classes)
+    return data[mask]
+
+
+def _is_int(v):
+    return isinstance(v, int) and not isinstance(v, bool)
+
+
+def _is_class_list(v):
+    return isinstance(v, list) and len(v) > 0 and all(_is_int(c) and c >= 0 for c in v)
+
+
+class StreamConfig:
+    """Per-stream pipeline settings.
+
+    Instances are never mutated: updated() returns a new config, and the capture
+    loop reads stream.config once per frame, so changes apply atomically between frames.
+    """
+    # name -> (validator, error message)
+    FIELDS = {
+        'confidence_threshold': (lambda v: isinstance(v, (int, float)) and not isinstance(v, bool) and 0 < v <= 1,
+                                 'must be a number in (0, 1]'),
+        'target_classes_arms': (_is_class_list, 'must be a non-empty list of class ids'),
+        'target_classes_helmets': (_is_class_list, 'must be a non-empty list of class ids'),
+        'imgsz': (lambda v: _is_int(v) and 32 <= v <= 1280 and v % 32 == 0,
+                  'must be a multiple of 32 between 32 and 1280'),
+        'jpeg_quality': (lambda v: _is_int(v) and 10 <= v <= 100, 'must be an integer between 10 and 100'),
+        'buffer_size': (lambda v: _is_int(v) and 1 <= v <= 10, 'must be an integer between 1 and 10'),
+        'frame_skip': (lambda v: _is_int(v) and 0 <= v <= 30, 'must be an integer between 0 and 30'),
+        'output_scale': (lambda v: isinstance(v, (int, float)) and not isinstance(v, bool) and 0.25 <= v <= 1,
+                         'must be a number between 0.25 and 1'),
+        'inference_enabled': (lambda v: isinstance(v, bool), 'must be true or false'),
+        'qos_enabled': (lambda v: isinstance(v, bool), 'must be true or false'),
+        'latency_budget_ms': (lambda v: _is_int(v) and 50 <= v <= 60000, 'must be an integer between 50 and 60000'),
+        'priority': (lambda v: v in ('high', 'normal', 'low'), 'must be "high", "normal" or "low"'),
+    }
+
+    def __init__(self, **values):
+        defaults = {
+            'confidence_threshold': CONFIDENCE_THRESHOLD,
+            'target_classes_arms': TARGET_CLASSES_ARMS,
+            'target_classes_helmets': TARGET_CLASSES_HELMETS,
+            'imgsz': INFERENCE_IMGSZ,
+            'jpeg_quality': JPEG_QUALITY,
+            'buffer_size': CAPTURE_BUFFER_SIZE,
+            'frame_skip': FRAME_SKIP,
+            'output_scale': 1.0,
+            'inference_enabled': True,
+            'qos_enabled': True,
+            'latency_budget_ms': QOS_LATENCY_BUDGET_MS,
+            'priority': 'normal',
+        }
+        defaults.update(values)
+        for name in self.FIELDS:
+            value = defaults[name]
+            setattr(self, name, list(value) if isinstance(value, list) else value)
+        self.confidence_threshold = float(self.confidence_threshold)
+        self.output_scale = float(self.output_scale)
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.FIELDS}
+
+    def updated(self, changes):
+        """Return (new_config, errors); new_config is None if any change is invalid"""
+        if not isinstance(changes, dict):
+            return None, {'_': 'expected a JSON object'}
+        errors = {}
+        for name, value in changes.items():
+            if name not in self.FIELDS:
+                errors[name] = 'unknown setting'
+                continue
+            is_valid, message = self.FIELDS[name]
+            if not is_valid(value):
+                errors[name] = message
+        if errors:
+            return None, errors
+        values = self.to_dict()
+        values.update(changes)
+        return StreamConfig(**values), {}
+
+
+# Serializes config updates: stream swap, saved_configs and the file write happen together
+_config_lock = threading.Lock()
+
+
+def load_saved_configs():
+    """Read persisted per-camera settings, ignoring invalid entries"""
+    try:
+        with open(CONFIG_PATH, encoding='utf-8') as f:
+            saved = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Could not read {CONFIG_PATH}: {e}")
+        return {}
+    
+    configs = {}
+    for name, changes in saved.items() if isinstance(saved, dict) else ():
+        config, errors = StreamConfig().updated(changes)
+        if config is None:
+            print(f"⚠️ Ignoring saved config for {name}: {errors}")
+            continue
+        configs[name] = config
+    return configs
+
+
+def save_configs(configs):
+    """Persist {camera: StreamConfig} atomically (write to a temp file, then rename).
+    Callers hold _config_lock."""
+    tmp_path = CONFIG_PATH + '.tmp'
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({name: config.to_dict() for name, config in configs.items()}, f, indent=2)
+        os.replace(tmp_path, CONFIG_PATH)
+        return True
+    except OSError as e:
+        print(f"⚠️ Could not save {CONFIG_PATH}: {e}")
+        return False
+
+
+class QoSController:
+    """Keeps a stream's end-to-end frame latency within its budget by degrading quality.
+
+    Level 0 is the configured pipeline. Each level down the ladder trades a
+    little more quality for throughput, in a fixed order: smaller inference
+    imgsz, more skipped frames, lower JPEG quality and output size, and finally
+    no inference at all (low-priority cameras only). It steps down while the
+    smoothed latency stays over budget and back up once it has stayed well
+    under it; every decision is logged. A level that is re-entered soon after
+    being left must stay under budget twice as long before the next step up,
+    so a camera does not flap between two levels.
+    """
+    # (description, overrides) - caps are min()'d with the configured value,
+    # frame_skip is added to it
+    LADDER = [
+        ("full quality", {}),
+        ("imgsz 320", {'imgsz': 320}),
+        ("imgsz 256", {'imgsz': 256}),
+        ("imgsz 256, skip +1", {'imgsz': 256, 'frame_skip': 1}),
+        ("imgsz 256, skip +2", {'imgsz': 256, 'frame_skip': 2}),
+        ("imgsz 256, skip +2, jpeg 60, 75% size", {'imgsz': 256, 'frame_skip': 2, 'jpeg_quality': 60, 'output_scale': 0.75}),
+        ("imgsz 256, skip +3, jpeg 45, 50% size", {'imgsz': 256, 'frame_skip': 3, 'jpeg_quality': 45, 'output_scale': 0.5}),
+        ("inference paused", {'imgsz': 256, 'frame_skip': 3, 'jpeg_quality': 45, 'output_scale': 0.5, 'inference_enabled': False}),
+    ]
+    EVAL_INTERVAL = 1.0   # seconds between decisions
+    DOWN_AFTER = 2        # consecutive evaluations over budget before stepping down
+    UP_AFTER = 5          # consecutive evaluations under RECOVER_RATIO * budget before stepping up
+    PAUSE_UP_AFTER = 15   # same, out of "inference paused" (resuming inference is the costliest step)
+    MAX_UP_AFTER = 300    # cap on the re-entry back-off
+    REENTRY_WINDOW = 60   # seconds: stepping back down into a level this soon after leaving it doubles its UP_AFTER
+    RECOVER_RATIO = 0.5
+    EWMA_ALPHA = 0.2
+
+    def __init__(self, camera):
+        self.camera = camera
+        self.level = 0
+        self.latency = 0.0
+        self.decisions = collections.deque(maxlen=200)
+        self._over = 0
+        self._under = 0
+        self._last_eval = 0
+        self._reentries = [0] * len(self.LADDER)
+        self._left_at = [0.0] * len(self.LADDER)
+        self._cache = (None, None, None)
+
+    def reset(self):
+        """Back to full quality (stream restarted); the decision log is kept"""
+        self.level = 0
+        self.latency = 0.0
+        self._over = self._under = 0
+        self._reentries = [0] * len(self.LADDER)
+        self._left_at = [0.0] * len(self.LADDER)
+        self._cache = (None, None, None)
+
+    def up_after(self, level):
+        """Consecutive good evaluations needed to step up out of level"""
+        base = self.PAUSE_UP_AFTER if level == len(self.LADDER) - 1 else self.UP_AFTER
+        return min(base * 2 ** self._reentries[level], self.MAX_UP_AFTER)
+
+    def max_level(self, config):
+        # Pausing inference is reserved for low-priority cameras
+        return len(self.LADDER) - 1 if config.priority == 'low' else len(self.LADDER) - 2
+
+    def effective(self, config):
+        """Config with the current level's degradations applied"""
+        if not config.qos_enabled or self.level == 0:
+            return config
+        base, level, cached = self._cache
+        if base is config and level == self.level:
+            return cached
+        values = config.to_dict()
+        for name, value in self.LADDER[self.level][1].items():
+            if name == 'frame_skip':
+                values[name] = min(config.frame_skip + value, 30)
+            elif name == 'inference_enabled':
+                values[name] = config.inference_enabled and value
+            else:
+                values[name] = min(values[name], value)
+        effective = StreamConfig(**values)
+        self._cache = (config, self.level, effective)
+        return effective
+
+    def observe(self, latency, config):
+        """Record one frame's end-to-end latency (seconds) and adjust the level if due"""
+        self.latency += self.EWMA_ALPHA * (latency - self.latency)
+        now = time.time()
+        if now - self._last_eval < self.EVAL_INTERVAL:
+            return
+        self._last_eval = now
+
+        if not config.qos_enabled:
+            if self.level:
+                self._set_level(0, "QoS disabled", config)
+            return
+
+        budget = config.latency_budget_ms / 1000
+        if self.latency > budget:
+            self._over += 1
+            self._under = 0
+            if self._over >= self.DOWN_AFTER and self.level < self.max_level(config):
+                self._set_level(self.level + 1, "latency over budget", config)
+        elif self.latency < budget * self.RECOVER_RATIO:
+            self._under += 1
+            self._over = 0
+            if self.level > 0 and self._under >= self.up_after(self.level):
+                self._set_level(self.level - 1, "latency recovered", config)
+        else:
+            self._over = self._under = 0
+
+        if self.level > self.max_level(config):
+            self._set_level(self.max_level(config), "priority changed", config)
+
+    def _set_level(self, level, reason, config):
+        now = time.time()
+        if level > self.level:
+            # Back down into a level we recovered from only recently: hold it longer next time
+            if now - self._left_at[level] < self.REENTRY_WINDOW:
+                self._reentries[level] += 1
+            else:
+                self._reentries[level] = 0
+        elif level < self.level:
+            self._left_at[self.level] = now
+
+        decision = {
+            'time': round(now, 3),
+            'camera': self.camera,
+            'from': self.level,
+            'to': level,
+            'action': self.LADDER[level][0],
+            'reason': reason,
+            'latency_ms': round(self.latency * 1000, 1),
+            'budget_ms': config.latency_budget_ms,
+            'up_after': self.up_after(level),
+        }
+        self.decisions.append(decision)
+        self.level = level
+        self._over = self._under = 0
+        hold = ""
+        if level > decision['from'] and self._reentries[level]:
+            hold = f", re-entered: {decision['up_after']} good evaluations to step up"
+        print(f"🎚️ QoS [{self.camera}] level {decision['from']} -> {level} ({decision['action']}): "
+              f"{reason}, latency {decision['latency_ms']}ms / budget {config.latency_budget_ms}ms{hold}")
+
+    def to_dict(self):
+        return {
+            'level': self.level,
+            'action': self.LADDER[self.level][0],
+            'latency_ms': round(self.latency * 1000, 1),
+            'up_after': self.up_after(self.level),
+            'decisions': list(self.decisions),
+        }
+
+
+class OverlayRenderer:
+    """Minimal in-place box/label renderer (replacement for Results.plot()).
+
+    Label text sizes are cached, so each distinct label is measured only once.
+    """
+    FONT = cv2.FONT_HERSHEY_SIMPLEX
+    LABEL_SCALE = 0.5
+    LABEL_THICKNESS = 1
+    MAX_CACHED_LABELS = 1024
+
     def __init__(self):
+        self._label_sizes = {}
+
+    def _label_size(self, text):
+        size = self._label_sizes.get(text)
+        if size is None:
+            if len(self._label_sizes) >= self.MAX_CACHED_LABELS:
+                self._label_sizes.clear()
+            (w, h), baseline = cv2.getTextSize(text, self.FONT, self.LABEL_SCALE, self.LABEL_THICKNESS)
+            size = self._label_sizes[text] = (w, h + baseline)
+        return size
+
+    def draw_detections(self, frame, detections, names, color):
+        """Draw boxes with "<name> <conf>" labels directly onto frame"""
+        for x1, y1, x2, y2, conf, cls in detections.tolist():
+            x1, y1, x2, y2 = int(x1), int(y1), int(x2), int(y2)
+            cls = int(cls)
+            text = f"{names.get(cls, cls)} {conf:.2f}"
+            w, h = self._label_size(text)
+            cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+            top = y1 - h - 2 if y1 - h - 2 >= 0 else y1
+            cv2.rectangle(frame, (x1, top), (x1 + w + 2, top + h + 2), color, -1)
+            cv2.putText(frame, text, (x1 + 1, top + h - 2), self.FONT, self.LABEL_SCALE,
+                        (255, 255, 255), self.LABEL_THICKNESS, cv2.LINE_AA)
+        return frame
+
+    def draw_status(self, frame, fps, source_type):
+        """Draw the FPS and Source text directly onto frame"""
+        cv2.putText(frame, f"FPS: {fps:.2f}", (10, 30), self.FONT, 0.8, (0, 255, 0), 2)
+        cv2.putText(frame, f"Source: {source_type}", (10, 60), self.FONT, 0.6, (0, 255, 255), 2)
+        return frame
+
+
+class MosaicBuilder:
+    """Composes downscaled thumbnails of all cameras into one JPEG.
+
+    The mosaic is rebuilt at most max_fps times per second and only when a
+    camera has published a new frame; every requester shares the same bytes.
+    The ETag carries the builder's creation time, so it never names different
+    content after a restart.
+    """
+    def __init__(self, thumb_width=320, thumb_height=180, max_fps=2.0, quality=70):
+        self.thumb_width = thumb_width
+        self.thumb_height = thumb_height
+        self.min_interval = 1.0 / max_fps
+        self.quality = quality
+        self.latest = None  # (jpeg_bytes, etag, changed_at, replaced_at), swapped as a whole
+        self.version = 0
+        self._epoch = int(time.time() * 1000)
+        self._checked_at = 0
+        self._key = None
+        self._lock = threading.Lock()
+
+    def get(self, cameras):
+        """Return (jpeg_bytes, etag, changed_at, replaced_at) for the given {name: VideoStream} mapping"""
+        latest = self.latest
+        if latest is not None and time.time() - self._checked_at < self.min_interval:
+            return latest
+        with self._lock:
+            # Another requester may have rebuilt it while we waited
+            if self.latest is None or time.time() - self._checked_at >= self.min_interval:
+                self._build(cameras)
+            return self.latest
+
+    def _thumbnail(self, jpeg):
+        """Decode a JPEG straight to a reduced size (DCT-domain scaling) and fit it to a tile"""
+        flags = cv2.IMREAD_REDUCED_COLOR_4 if len(jpeg) > 150_000 else cv2.IMREAD_REDUCED_COLOR_2
+        img = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), flags)
+        if img is None:
+            return None
+        return cv2.resize(img, (self.thumb_width, self.thumb_height), interpolation=cv2.INTER_AREA)
+
+    def _build(self, cameras):
+        names = sorted(cameras)
+        key = tuple((name, cameras[name].latest_seq) for name in names)
+        self._checked_at = time.time()
+        if key == self._key and self.latest is not None:
+            return
+
+        cols = max(1, math.ceil(math.sqrt(len(names))))
+        rows = max(1, math.ceil(len(names) / cols))
+        mosaic = np.zeros((rows * self.thumb_height, cols * self.thumb_width, 3), dtype=np.uint8)
+        for i, name in enumerate(names):
+            y = (i // cols) * self.thumb_height
+            x = (i % cols) * self.thumb_width
+            jpeg = cameras[name].latest_jpeg
+            thumb = self._thumbnail(jpeg) if jpeg else None
+            if thumb is not None:
+                mosaic[y:y + self.thumb_height, x:x + self.thumb_width] = thumb
+            else:
+                cv2.putText(mosaic, "No signal", (x + 10, y + self.thumb_height // 2),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.6, (128, 128, 128), 1)
+            cv2.putText(mosaic, name, (x + 6, y + self.thumb_height - 8),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 1, cv2.LINE_AA)
+
+        ret, buffer = cv2.imencode('.jpg', mosaic, [int(cv2.IMWRITE_JPEG_QUALITY), self.quality])
+        if ret:
+            self.version += 1
+            replaced_at = self.latest[2] if self.latest else 0
+            self.latest = (buffer.tobytes(), f"mosaic-{self._epoch}-{self.version}", time.time(), replaced_at)
+            self._key = key
+
+
+COLOR_ARMS = (0, 0, 255)
+COLOR_HELMET = (255, 128, 0)
+
+
+class FramePool:
+    """Recycled frame arrays for cap.read() to decode into.
+
+    VideoCapture.read(image) reuses the given array when its shape matches, so
+    after warm-up the hot loop stops allocating a new frame per iteration.
+    """
+    def __init__(self, size=3):
+        self.size = size
+        self._free = []
+        self._shape = None
+        self._lock = threading.Lock()
+    
+    def acquire(self):
+        """A recycled frame, or None (cv2 allocates one, which joins the pool on release)"""
+        with self._lock:
+            return self._free.pop() if self._free else None
+    
+    def release(self, frame):
+        if frame is None:
+            return
+        with self._lock:
+            if frame.shape != self._shape:
+                # Resolution changed: drop arrays of the old size
+                self._shape = frame.shape
+                self._free.clear()
+            if len(self._free) < self.size:
+                self._free.append(frame)
+
+
+MJPEG_PART_HEADER = b'--frame\r\nContent-Type: image/jpeg\r\nContent-Length: %d\r\n\r\n'
+MJPEG_PART_TRAILER = b'\r\n'
+
+
+class MJPEGReader:
+    """Reads compressed JPEG frames from an HTTP multipart (MJPEG) source without decoding them.
+
+    Each part is cut by its Content-Length header when the server sends one,
+    otherwise at the next boundary. Sources without a boundary fall back to
+    scanning for the JPEG SOI/EOI markers.
+    """
+    def __init__(self, url, timeout=10, chunk_size=65536):
+        self._response = urllib.request.urlopen(url, timeout=timeout)
+        content_type = self._response.headers.get('Content-Type', '')
+        if 'multipart' not in content_type and 'jpeg' not in content_type:
+            self._response.close()
+            raise Exception(f"Not an MJPEG stream (Content-Type: {content_type or 'unknown'})")
+        boundary = content_type.partition('boundary=')[2].split(';')[0].strip().strip('"')
+        self._boundary = boundary.encode() if boundary else None
+        self._chunk_size = chunk_size
+        self._buf = bytearray()
+        self._scan = 0
+    
+    def read(self):
+        """Next complete JPEG as bytes, or None when the stream ends"""
+        if self._boundary is None:
+            return self._read_markers()
+        while True:
+            jpeg = self._next_part()
+            if jpeg is not None:
+                return jpeg
+            chunk = self._response.read1(self._chunk_size)
+            if not chunk:
+                return None
+            self._buf += chunk
+    
+    def _next_part(self):
+        """Cut the first complete part out of the buffer; None if more data is needed"""
+        while True:
+            start = self._buf.find(self._boundary)
+            if start < 0:
+                return None
+            header_end = self._buf.find(b'\r\n\r\n', start)
+            if header_end < 0:
+                return None
+            body_start = header_end + 4
+            length = None
+            for line in bytes(self._buf[start:header_end]).split(b'\r\n')[1:]:
+                name, _, value = line.partition(b':')
+                if name.strip().lower() == b'content-length' and value.strip().isdigit():
+                    length = int(value)
+            
+            if length is not None:
+                if len(self._buf) < body_start + length:
+                    return None
+                jpeg = bytes(self._buf[body_start:body_start + length])
+                del self._buf[:body_start + length]
+                self._scan = 0
+                return jpeg
+            
+            # No Content-Length: the image ends at the last EOI before the next boundary
+            end = self._buf.find(self._boundary, max(body_start, self._scan))
+            if end < 0:
+                self._scan = max(len(self._buf) - len(self._boundary), body_start)
+                return None
+            eoi = self._buf.rfind(b'\xff\xd9', body_start, end)
+            jpeg = bytes(self._buf[body_start:eoi + 2]) if eoi >= 0 else None
+            del self._buf[:end]
+            self._scan = 0
+            if jpeg:
+                return jpeg
+    
+    def _scan_start(self):
+        """Offset of the entropy-coded data after the header segments of the JPEG at the
+        start of the buffer (EXIF thumbnails carry their own EOI); None if incomplete"""
+        buf = self._buf
+        pos = 2
+        while pos + 4 <= len(buf):
+            if buf[pos] != 0xFF:
+                return 2  # not a segment header: fall back to a plain scan
+            marker = buf[pos + 1]
+            if marker == 0xFF:
+                pos += 1  # fill byte
+                continue
+            pos += 2 + ((buf[pos + 2] << 8) | buf[pos + 3])
+            if marker == 0xDA:  # SOS: image data follows
+                return pos
+        return None
+    
+    def _read_markers(self):
+        """Fallback without a boundary: next SOI..EOI, or None when the stream ends"""
+        while True:
+            start = self._buf.find(b'\xff\xd8')
+            if start >= 0:
+                if start:
+                    # Drop whatever precedes the image
+                    del self._buf[:start]
+                    self._scan = 0
+                data_start = self._scan_start()
+                end = self._buf.find(b'\xff\xd9', max(self._scan, data_start)) if data_start else -1
+                if end >= 0:
+                    jpeg = bytes(self._buf[:end + 2])
+                    del self._buf[:end + 2]
+                    self._scan = 0
+                    return jpeg
+                if data_start:
+                    self._scan = max(len(self._buf) - 1, data_start)
+            chunk = self._response.read1(self._chunk_size)
+            if not chunk:
+                return None
+            self._buf += chunk
+    
+    def release(self):
+        self._response.close()
+
+
+class VideoStream:
+    def __init__(self, name=None):
+        self.name = name or DEFAULT_CAMERA
+        self.config = saved_configs.get(self.name) or StreamConfig()
+        self.qos = QoSController(self.name)
         self.cap = None
         self.is_running = False
         self.counter_arms = 0
         self.counter_helmet = 0
-        self.frame_skip = 0
         self.frame_count = 0
         self.current_fps = 0
         self.video_source = ""
         self.status = "Ready"
         self.loop_video = True  # Loop the video when it ends
+        self.source_type = "STREAM"
+        self.passthrough = False  # forward source JPEGs untouched, detections via /detections
+        self.renderer = OverlayRenderer()
+        self.frame_pool = FramePool()
+        self._scaled = None  # reused output buffer for output_scale < 1
+        
+        # Capture runs in its own thread; viewers wait for the latest encoded frame
+        self._capture_thread = None
+        self._frame_cond = threading.Condition()
+        self.latest_jpeg = None
+        self.latest_part = None  # (multipart header, jpeg), shared by every viewer
+        self.latest_seq = 0
+        self.latest_time = 0
+        self._replaced_time = 0  # publish time of the frame latest_jpeg replaced
+        self._epoch = 0
         
-    def start_stream(self, video_source):
+        # Detection metadata channel (/detections)
+        self._detections_cond = threading.Condition()
+        self.latest_detections = None
+        self.detections_seq = 0
+        self._last_publish = 0
+        self._publish_interval = 0
+        self._frame_interval = 0
+        self._next_frame_time = 0
+        self._buffer_size = None
+        self.source_lag = 0
+        self._lag_baseline = None
+        
+    def start_stream(self, video_source, passthrough=False):
         if self.is_running:
             return False, "Stream is already running"
+        if passthrough and not video_source.startswith(('http://', 'https://')):
+            return False, "Passthrough mode needs an HTTP/MJPEG source"
         
-        # Load models if not already loaded
-        global model_arms, model_helmet
-        if model_arms is None or model_helmet is None:
+        # Load models if not already loaded (first request pays the import cost)
+        if not detection_enabled():
             try:
                 self.status = "Loading models..."
-                # Update paths or comment out if models don't exist
-                # model_arms = YOLO("gun_detectionultimo.pt").to(device)
-                # model_helmet = YOLO("helmet_detectionultimo.pt").to(device)
-                print("⚠️ Models not loaded - detection disabled. Update model paths to enable.")
+                ok, message = load_models()
+                if not ok:
+                    raise Exception(message)
+                if not detection_enabled():
+                    print("⚠️ Models not loaded - detection disabled. Set MODEL_ARMS_PATH and MODEL_HELMET_PATH to enable.")
             except Exception as e:
                 self.status = "Model loading failed"
                 return False, f"Failed to load models: {str(e)}"
@@ -73,7 +746,10 @@ class VideoStream:
             self.status = "Connecting to video source..."
             
             # Check if it's a file path or RTSP URL
-            if os.path.isfile(video_source):
+            if passthrough:
+                print(f"🌐 Connecting to MJPEG stream (passthrough): {video_source}")
+                self.cap = MJPEGReader(video_source)
+            elif os.path.isfile(video_source):
                 print(f"📁 Loading video file: {video_source}")
                 self.cap = cv2.VideoCapture(video_source)
             else:
@@ -82,15 +758,33 @@ class VideoStream:
                 os.environ["OPENCV_FFMPEG_CAPTURE_OPTIONS"] = "rtsp_transport;tcp|buffer_size;1024000"
                 self.cap = cv2.VideoCapture(video_source, cv2.CAP_FFMPEG)
             
-            # Set buffer and thread settings
-            self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 3)
-            
-            if not self.cap.isOpened():
-                raise Exception("Unable to open video source")
+            if not passthrough:
+                # Set buffer and thread settings
+                self._buffer_size = self.config.buffer_size
+                self.cap.set(cv2.CAP_PROP_BUFFERSIZE, self._buffer_size)
+                
+                if not self.cap.isOpened():
+                    raise Exception("Unable to open video source")
             
             self.is_running = True
+            self.passthrough = passthrough
             self.video_source = video_source
+            self.source_type = "MJPEG" if passthrough else "FILE" if os.path.isfile(video_source) else "STREAM"
             self.status = "Streaming..."
+            self._epoch = int(time.time() * 1000)
+            self._last_publish = self._publish_interval = 0
+            # Files are paced at their native frame rate; live sources pace themselves
+            if self.source_type == "FILE":
+                fps = self.cap.get(cv2.CAP_PROP_FPS)
+                self._frame_interval = 1.0 / fps if 0 < fps <= 240 else 1.0 / 25
+            else:
+                self._frame_interval = 0
+            self._next_frame_time = time.time()
+            self.source_lag = 0
+            self._lag_baseline = None
+            self.qos.reset()
+            self._capture_thread = threading.Thread(target=self._capture_loop, daemon=True)
+            self._capture_thread.start()
             return True, "Stream started successfully"
             
         except Exception as e:
@@ -101,116 +795,546 @@ class VideoStream:
     
     def stop_stream(self):
         self.is_running = False
+        with self._frame_cond:
+            self._frame_cond.notify_all()
+        if self._capture_thread and self._capture_thread is not threading.current_thread():
+            self._capture_thread.join(timeout=5)
+        self._capture_thread = None
         if self.cap:
             self.cap.release()
             self.cap = None
         self.status = "Stopped"
         self.current_fps = 0
+    
+    def _next_config(self):
+        """Config snapshot for the next frame (with QoS degradations); applies capture-level changes"""
+        config = self.qos.effective(self.config)
+        if not self.passthrough and config.buffer_size != self._buffer_size:
+            self._buffer_size = config.buffer_size
+            self.cap.set(cv2.CAP_PROP_BUFFERSIZE, self._buffer_size)
+        return config
+    
+    def update_config(self, changes):
+        """Validate and swap in new settings; returns (config, errors)"""
+        config, errors = self.config.updated(changes)
+        if config is not None:
+            self.config = config
+        return config, errors
+    
+    def _read_frame(self, into=None):
+        """Read the next frame, looping file sources. Returns None when the source is exhausted.
+
+        Decodes into `into` when given (the caller owns it), else into a FramePool array.
+        """
+        if self._frame_interval:
+            delay = self._next_frame_time - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            self._next_frame_time = max(self._next_frame_time + self._frame_interval, time.time() - self._frame_interval)
         
-    def generate_frames(self):
-        while self.is_running and self.cap:
+        buffer = into if into is not None else self.frame_pool.acquire()
+        ret, frame = self.cap.read(buffer)
+        
+        # If video ends and loop is enabled, restart it
+        if not ret:
+            if self.loop_video and self.source_type == "FILE":
+                print("🔄 Restarting video loop...")
+                self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                ret, frame = self.cap.read(buffer)
+            if not ret:
+                if into is None:
+                    self.frame_pool.release(buffer)
+                return None
+        
+        # How far a live source has fallen behind real time (frames queued upstream)
+        if self.source_type == "STREAM":
+            pos = self.cap.get(cv2.CAP_PROP_POS_MSEC)
+            if pos > 0:
+                offset = time.time() - pos / 1000
+                if self._lag_baseline is None or offset < self._lag_baseline:
+                    self._lag_baseline = offset
+                self.source_lag = offset - self._lag_baseline
+        return frame
+    
+    def _capture_loop(self):
+        try:
+            if self.passthrough:
+                self._run_passthrough()
+            elif inference_pool is not None:
+                self._run_pooled()
+            else:
+                self._run_inline()
+        except Exception as e:
+            print(f"⚠️ Capture loop error: {e}")
+            if self.is_running:
+                self.stop_stream()
+                self.status = f"Stopped: {e}"
+        finally:
+            if self.is_running:
+                self.stop_stream()
+    
+    def _run_inline(self):
+        """Capture, detect, draw and encode in this thread (models in-process or disabled)"""
+        while self.is_running:
             try:
-                start_time = time.time()
-                ret, frame = self.cap.read()
-                
-                # If video ends and loop is enabled, restart it
-                if not ret:
-                    if self.loop_video and os.path.isfile(self.video_source):
-                        print("🔄 Restarting video loop...")
-                        self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-                        continue
-                    else:
-                        self.stop_stream()
+                frame = self._read_frame()
+                if frame is None:
+                    break
+                try:
+                    self._process_inline(frame, time.time() - self.source_lag)
+                finally:
+                    # Drawn, encoded and published: the array can take the next frame
+                    self.frame_pool.release(frame)
+            except Exception as e:
+                print(f"⚠️ Frame processing error: {e}")
+                continue
+    
+    def _process_inline(self, frame, captured_at):
+        config = self._next_config()
+        self.frame_count += 1
+        if self.frame_count % (config.frame_skip + 1) != 0:
+            return
+        
+        if model_arms is not None and model_helmet is not None and config.inference_enabled:
+            try:
+                # Inferencias
+                results_arms = model_arms.predict(source=frame, imgsz=config.imgsz, conf=config.confidence_threshold, verbose=False)
+                results_helmet = model_helmet.predict(source=frame, imgsz=config.imgsz, conf=config.confidence_threshold, verbose=False)
+                self._handle_detections(frame, config,
+                                        results_arms[0].boxes.data, results_arms[0].names,
+                                        results_helmet[0].boxes.data, results_helmet[0].names,
+                                        self.frame_count, captured_at)
+            except Exception as e:
+                print(f"Detection error: {e}")
+        
+        self._publish(frame, config, captured_at)
+    
+    def _run_pooled(self):
+        """Capture here, run inference in the worker pool, draw and encode results in order"""
+        pool = inference_pool
+        replies = queue.Queue()
+        in_flight = {}  # slot -> (config, captured_at) of the frame in it
+        # One slot stays reserved for decoding the next frame into
+        max_in_flight = max(1, min(pool.workers, pool.slots - 1))
+        last_seq = 0
+        decode_slot = None  # reserved slot the next frame is decoded into (zero-copy)
+        shape = None        # (height, width) of the last frame
+        
+        def handle_reply(reply):
+            nonlocal last_seq
+            slot, seq, frame, dets_arms, names_arms, dets_helmet, names_helmet = reply
+            config, captured_at = in_flight.pop(slot, None) or (self.config, time.time())
+            try:
+                # Workers may finish out of order; never publish an older frame
+                if seq > last_seq:
+                    last_seq = seq
+                    self._handle_detections(frame, config, dets_arms, names_arms, dets_helmet, names_helmet,
+                                            seq, captured_at)
+                    self._publish(frame, config, captured_at)
+            finally:
+                pool.release(slot)
+        
+        try:
+            while self.is_running:
+                if not pool.healthy():
+                    raise RuntimeError("Inference worker died")
+                try:
+                    # Decode straight into a shared-memory slot once the frame size is known;
+                    # the first frame, a size change or an oversized source go through FramePool
+                    if decode_slot is None:
+                        decode_slot = pool.acquire_slot(timeout=0)
+                    view = pool.slot_view(decode_slot, *shape) if decode_slot is not None and shape else None
+                    frame = self._read_frame(view)
+                    if frame is None:
                         break
-                
-                self.frame_count += 1
-                if self.frame_count % (self.frame_skip + 1) != 0:
-                    continue
-                
-                # Process frame with models if available
-                annotated_frame = frame.copy()
-                
-                if model_arms is not None and model_helmet is not None:
+                    shape = frame.shape[:2]
+                    in_slot = frame is view  # else the slot, if any, stays reserved for the next read
+                    captured_at = time.time() - self.source_lag
+                    
+                    config = self._next_config()
+                    self.frame_count += 1
+                    if self.frame_count % (config.frame_skip + 1) != 0:
+                        if not in_slot:
+                            self.frame_pool.release(frame)
+                        continue
+                    
+                    if not config.inference_enabled:
+                        # Inference paused: publish directly and drop any older in-flight results
+                        last_seq = self.frame_count
+                        try:
+                            self._publish(frame, config, captured_at)
+                        finally:
+                            if not in_slot:
+                                self.frame_pool.release(frame)
+                        continue
+                    
+                    # Wait for a result when every worker is busy (backpressure on capture)
+                    while len(in_flight) >= max_in_flight and self.is_running:
+                        try:
+                            handle_reply(replies.get(timeout=1.0))
+                        except queue.Empty:
+                            if not pool.healthy():
+                                break
+                    if len(in_flight) >= max_in_flight:
+                        # Stopped, or a worker died holding a frame
+                        if not in_slot:
+                            self.frame_pool.release(frame)
+                        continue
+                    
+                    # A frame already in its slot is handed over as is; any other one is
+                    # copied (downscaled if oversized) into a slot and recycled right away
+                    slot = decode_slot if decode_slot is not None else pool.acquire_slot()
+                    decode_slot = None
                     try:
-                        # Inferencias
-                        results_arms = model_arms.predict(source=frame, imgsz=416, conf=CONFIDENCE_THRESHOLD, verbose=False)
-                        results_helmet = model_helmet.predict(source=frame, imgsz=416, conf=CONFIDENCE_THRESHOLD, verbose=False)
-                        
-                        # Filtrar clases
-                        boxes_arms = results_arms[0].boxes
-                        keep_arms = [i for i, cls in enumerate(boxes_arms.cls) if int(cls) in TARGET_CLASSES_ARMS]
-                        results_arms[0].boxes = boxes_arms[keep_arms]
-                        
-                        boxes_helmet = results_helmet[0].boxes
-                        keep_helmet = [i for i, cls in enumerate(boxes_helmet.cls) if int(cls) in TARGET_CLASSES_HELMETS]
-                        results_helmet[0].boxes = boxes_helmet[keep_helmet]
-                        
-                        annotated_frame = results_arms[0].plot(img=annotated_frame)
-                        annotated_frame = results_helmet[0].plot(img=annotated_frame)
-                        
-                        # Contadores de detección
-                        if len(results_arms[0].boxes) > 0:
-                            self.counter_arms += 1
-                        else:
-                            self.counter_arms = 0
-                        
-                        if len(results_helmet[0].boxes) > 0:
-                            self.counter_helmet += 1
-                        else:
-                            self.counter_helmet = 0
-                        
-                        # 🚨 Enviar alerta al bot cada 5 detecciones
-                        if self.counter_arms == 5 or self.counter_helmet == 5:
-                            resized = cv2.resize(annotated_frame, (640, 480))
-                            _, buffer = cv2.imencode(".jpg", resized, [int(cv2.IMWRITE_JPEG_QUALITY), 70])
-                            
-                            try:
-                                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                                sock.connect(("127.0.0.1", 9999))
-                                size = struct.pack(">L", len(buffer))
-                                sock.sendall(size + buffer.tobytes())
-                                sock.close()
-                                print("📨 Alerta enviada al bot")
-                            except Exception as e:
-                                print(f"⚠️ No se pudo enviar alerta: {e}")
-                            
-                            self.counter_arms = 0
-                            self.counter_helmet = 0
-                    except Exception as e:
-                        print(f"Detection error: {e}")
-                
-                # Calculate FPS
-                elapsed = time.time() - start_time
-                self.current_fps = 1.0 / elapsed if elapsed > 0 else 0
-                
-                # Add FPS and source info to frame
-                cv2.putText(annotated_frame, f"FPS: {self.current_fps:.2f}", (10, 30),
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
-                
-                source_type = "FILE" if os.path.isfile(self.video_source) else "STREAM"
-                cv2.putText(annotated_frame, f"Source: {source_type}", (10, 60),
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
-                
-                # Encode frame with optimized quality
-                encode_param = [int(cv2.IMWRITE_JPEG_QUALITY), 75]
-                ret, buffer = cv2.imencode('.jpg', annotated_frame, encode_param)
-                if not ret:
-                    continue
+                        if slot is not None:
+                            pool.submit_slot(slot, frame, self.frame_count, config.imgsz,
+                                             config.confidence_threshold, replies)
+                            in_flight[slot] = (config, captured_at)
+                    finally:
+                        if not in_slot:
+                            self.frame_pool.release(frame)
                     
-                frame_bytes = buffer.tobytes()
+                    # Emit whatever has finished without blocking capture
+                    while True:
+                        try:
+                            handle_reply(replies.get_nowait())
+                        except queue.Empty:
+                            break
+                except Exception as e:
+                    print(f"⚠️ Frame processing error: {e}")
+                    continue
+        finally:
+            if decode_slot is not None:
+                pool.release(decode_slot)
+            for slot in list(in_flight):
+                if pool.abandon(slot):
+                    del in_flight[slot]
+            while in_flight:
+                try:
+                    slot = replies.get(timeout=1.0)[0]
+                except queue.Empty:
+                    break
+                in_flight.pop(slot, None)
+                pool.release(slot)
+    
+    def _run_passthrough(self):
+        """Forward the source's JPEGs untouched; the detector thread decodes only what it consumes"""
+        detector = None
+        if detection_enabled():
+            detector = threading.Thread(target=self._detect_latest, daemon=True)
+            detector.start()
+        
+        while self.is_running:
+            jpeg = self.cap.read()
+            if jpeg is None:
+                break
+            captured_at = time.time()
+            self.frame_count += 1
+            self._tick_fps(captured_at)
+            self._store_jpeg(jpeg, captured_at)
+            self.qos.observe(time.time() - captured_at, self.config)
+        
+        if detector:
+            with self._frame_cond:
+                self._frame_cond.notify_all()
+    
+    def _detect_latest(self):
+        """Passthrough detector: decode and run inference on the newest frame whenever idle"""
+        last_seq = 0
+        while self.is_running:
+            if not detection_enabled():
+                # Worker pool died: keep forwarding video, without detections
+                self.status = "Streaming (detection stopped: inference worker died)"
+                print("⚠️ Inference worker died - passthrough detections stopped")
+                return
+            try:
+                config = self._next_config()
+                with self._frame_cond:
+                    self._frame_cond.wait_for(
+                        lambda: self.latest_seq > last_seq + config.frame_skip or not self.is_running, timeout=1.0)
+                    if not self.is_running or self.latest_seq <= last_seq + config.frame_skip:
+                        continue
+                    last_seq, jpeg, captured_at = self.latest_seq, self.latest_jpeg, self.latest_time
                 
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-                       
+                if not config.inference_enabled:
+                    continue
+                frame = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+                if frame is None:
+                    continue
+                result = self._infer(frame, config, last_seq)
+                if result is not None:
+                    self._handle_detections(frame, config, *result, last_seq, captured_at, draw=False)
             except Exception as e:
-                print(f"⚠️ Frame processing error: {e}")
-                continue
+                print(f"Detection error: {e}")
+    
+    def _infer(self, frame, config, seq):
+        """Run both detectors on one frame synchronously (in-process or via the worker pool).
+
+        Returns (data_arms, names_arms, data_helmet, names_helmet) or None.
+        """
+        if inference_pool is not None:
+            replies = queue.Queue()
+            slot = inference_pool.submit(frame, seq, config.imgsz, config.confidence_threshold, replies)
+            if slot is None:
+                return None
+            deadline = time.time() + 30
+            while True:
+                try:
+                    reply = replies.get(timeout=1.0)
+                    break
+                except queue.Empty:
+                    if inference_pool.healthy() and time.time() < deadline:
+                        continue
+                    if not inference_pool.abandon(slot):
+                        inference_pool.release(replies.get()[0])
+                    return None
+            inference_pool.release(slot)
+            return reply[3:]
+        
+        if model_arms is None or model_helmet is None:
+            return None
+        results_arms = model_arms.predict(source=frame, imgsz=config.imgsz, conf=config.confidence_threshold, verbose=False)
+        results_helmet = model_helmet.predict(source=frame, imgsz=config.imgsz, conf=config.confidence_threshold, verbose=False)
+        return (results_arms[0].boxes.data, results_arms[0].names,
+                results_helmet[0].boxes.data, results_helmet[0].names)
+    
+    def _handle_detections(self, frame, config, data_arms, names_arms, data_helmet, names_helmet,
+                           frame_id, captured_at, draw=True):
+        """Filter, draw and count detections on frame, publish them as metadata and send an alert when due.
+
+        With draw=False (passthrough, where the decoded frame is never shown) boxes
+        are only drawn on the alert image, and only when an alert is sent.
+        """
+        # Filtrar clases
+        dets_arms = filter_detections(data_arms, config.target_classes_arms)
+        dets_helmet = filter_detections(data_helmet, config.target_classes_helmets)
+        
+        self._publish_detections(frame, frame_id, captured_at,
+                                 (('arms', dets_arms, names_arms), ('helmet', dets_helmet, names_helmet)))
+        
+        if draw:
+            self.renderer.draw_detections(frame, dets_arms, names_arms, COLOR_ARMS)
+            self.renderer.draw_detections(frame, dets_helmet, names_helmet, COLOR_HELMET)
+        
+        # Contadores de detección
+        if len(dets_arms) > 0:
+            self.counter_arms += 1
+        else:
+            self.counter_arms = 0
+        
+        if len(dets_helmet) > 0:
+            self.counter_helmet += 1
+        else:
+            self.counter_helmet = 0
+        
+        # 🚨 Enviar alerta al bot cada 5 detecciones
+        if self.counter_arms == 5 or self.counter_helmet == 5:
+            resized = cv2.resize(frame, (640, 480))
+            if not draw:
+                height, width = frame.shape[:2]
+                scale = np.array([640 / width, 480 / height, 640 / width, 480 / height, 1, 1], dtype=np.float32)
+                self.renderer.draw_detections(resized, dets_arms * scale, names_arms, COLOR_ARMS)
+                self.renderer.draw_detections(resized, dets_helmet * scale, names_helmet, COLOR_HELMET)
+            _, buffer = cv2.imencode(".jpg", resized, [int(cv2.IMWRITE_JPEG_QUALITY), 70])
+            
+            try:
+                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                sock.connect(("127.0.0.1", 9999))
+                size = struct.pack(">L", len(buffer))
+                sock.sendall(size + buffer.tobytes())
+                sock.close()
+                print("📨 Alerta enviada al bot")
+            except Exception as e:
+                print(f"⚠️ No se pudo enviar alerta: {e}")
+            
+            self.counter_arms = 0
+            self.counter_helmet = 0
+    
+    def _publish_detections(self, frame, frame_id, captured_at, groups):
+        """Hand one frame's detections to every /detections subscriber"""
+        height, width = frame.shape[:2]
+        detections = []
+        for model, dets, names in groups:
+            for x1, y1, x2, y2, conf, cls in dets.tolist():
+                cls = int(cls)
+                detections.append({'model': model, 'label': str(names.get(cls, cls)), 'class': cls,
+                                   'confidence': round(conf, 3),
+                                   'box': [round(x1, 1), round(y1, 1), round(x2, 1), round(y2, 1)]})
+        message = {'camera': self.name, 'frame': frame_id, 'timestamp': round(captured_at, 3),
+                   'width': width, 'height': height, 'detections': detections}
+        with self._detections_cond:
+            self.latest_detections = message
+            self.detections_seq += 1
+            self._detections_cond.notify_all()
+    
+    def _tick_fps(self, now):
+        """Update the FPS from the (smoothed) interval between published frames"""
+        if self._last_publish:
+            elapsed = now - self._last_publish
+            self._publish_interval = elapsed if not self._publish_interval else \
+                self._publish_interval + 0.1 * (elapsed - self._publish_interval)
+            self.current_fps = 1.0 / self._publish_interval if self._publish_interval > 0 else 0
+        self._last_publish = now
+    
+    def _store_jpeg(self, jpeg, now):
+        # The part header is built once per frame; viewers write header, image and
+        # trailer as separate chunks instead of each concatenating a copy
+        part = (MJPEG_PART_HEADER % len(jpeg), jpeg)
+        with self._frame_cond:
+            self.latest_jpeg = jpeg
+            self.latest_part = part
+            self.latest_seq += 1
+            self._replaced_time = self.latest_time
+            self.latest_time = now
+            self._frame_cond.notify_all()
+    
+    def _publish(self, frame, config, captured_at):
+        """Draw the status text, encode and hand the frame to every viewer"""
+        if config.output_scale < 1:
+            height, width = frame.shape[:2]
+            size = (max(1, int(width * config.output_scale)), max(1, int(height * config.output_scale)))
+            if self._scaled is None or self._scaled.shape[:2] != (size[1], size[0]):
+                self._scaled = None
+            frame = self._scaled = cv2.resize(frame, size, dst=self._scaled, interpolation=cv2.INTER_AREA)
+        
+        now = time.time()
+        self._tick_fps(now)
+        
+        # Add FPS and source info to frame
+        self.renderer.draw_status(frame, self.current_fps, self.source_type)
+        
+        # Encode frame with optimized quality
+        encode_param = [int(cv2.IMWRITE_JPEG_QUALITY), config.jpeg_quality]
+        ret, buffer = cv2.imencode('.jpg', frame, encode_param)
+        if not ret:
+            return
+        
+        self._store_jpeg(buffer.tobytes(), now)
+        self.qos.observe(time.time() - captured_at, self.config)
+    
+    def snapshot(self):
+        """Latest encoded frame as (jpeg_bytes, etag, timestamp, replaced_at), or None before the first frame"""
+        with self._frame_cond:
+            if self.latest_jpeg is None:
+                return None
+            return (self.latest_jpeg, f"{self.name}-{self._epoch}-{self.latest_seq}",
+                    self.latest_time, self._replaced_time)
+        
+    def generate_frames(self):
+        last_seq = self.latest_seq
+        while self.is_running:
+            with self._frame_cond:
+                self._frame_cond.wait_for(lambda: self.latest_seq != last_seq or not self.is_running, timeout=1.0)
+                if self.latest_seq == last_seq:
+                    continue
+                last_seq = self.latest_seq
+                header, jpeg = self.latest_part
+            
+            yield header
+            yield jpeg
+            yield MJPEG_PART_TRAILER
+    
+    def generate_detections(self):
+        """Server-sent events: one JSON message per inferred frame"""
+        last_seq = self.detections_seq
+        if self.latest_detections is not None:
+            yield f"data: {json.dumps(self.latest_detections)}\n\n"
+        idle = 0
+        while True:
+            with self._detections_cond:
+                self._detections_cond.wait_for(lambda: self.detections_seq != last_seq, timeout=1.0)
+                message = self.latest_detections if self.detections_seq != last_seq else None
+                last_seq = self.detections_seq
+            if message is not None:
+                idle = 0
+                yield f"data: {json.dumps(message)}\n\n"
+            else:
+                idle += 1
+                if idle % 15 == 0:
+                    yield ": keepalive\n\n"
+
+saved_configs = load_saved_configs()
+streams = {name: VideoStream(name) for name in [DEFAULT_CAMERA, *saved_configs]}
+streams_lock = threading.Lock()
+video_stream = streams[DEFAULT_CAMERA]
+mosaic_builder = MosaicBuilder(max_fps=MOSAIC_MAX_FPS)
+
+
+def get_stream(name):
+    """Look up a registered camera by name. Returns None if unknown."""
+    return streams.get(name or DEFAULT_CAMERA)
+
+
+def get_or_new_stream(name):
+    """Registered camera, or a new unregistered VideoStream to add_stream() once it is set up.
+
+    Returns (stream, None) or (None, error message).
+    """
+    name = name or DEFAULT_CAMERA
+    stream = streams.get(name)
+    if stream is not None:
+        return stream, None
+    if not CAMERA_NAME_RE.match(name):
+        return None, 'Invalid camera name'
+    if len(streams) >= MAX_CAMERAS:
+        return None, f'Camera limit reached ({MAX_CAMERAS})'
+    return VideoStream(name), None
+
+
+def add_stream(stream):
+    """Register a camera. Returns the registered stream under its name (an existing one
+    if another request registered it first), or None when MAX_CAMERAS is reached."""
+    with streams_lock:
+        existing = streams.get(stream.name)
+        if existing is not None:
+            return existing
+        if len(streams) >= MAX_CAMERAS:
+            return None
+        streams[stream.name] = stream
+        return stream
+
+
+def apply_config(stream, changes):
+    """Update a camera's config, record it in saved_configs and persist it as one step,
+    so concurrent PATCHes neither lose updates nor race the file write.
+
+    Returns (config, errors, persisted); config is None if any change is invalid.
+    """
+    with _config_lock:
+        config, errors = stream.update_config(changes)
+        if config is None:
+            return None, errors, False
+        saved_configs[stream.name] = config
+        return config, errors, save_configs(saved_configs)
+
+
+def jpeg_response(jpeg, etag, timestamp, replaced_at=None):
+    """Serve an in-memory JPEG with ETag/Last-Modified, answering 304 when unchanged.
+
+    If-None-Match decides whenever it is sent. Last-Modified has one-second
+    resolution, so If-Modified-Since alone only gets a 304 when the image is
+    from an earlier whole second than the header date, or from that same
+    second while the image it replaced (published at replaced_at) is older -
+    then the client's copy can only be this one.
+    """
+    if request.if_none_match:
+        not_modified = request.if_none_match.contains_weak(etag)
+    elif request.if_modified_since:
+        since = int(request.if_modified_since.timestamp())
+        second = int(timestamp)
+        not_modified = second < since or (second == since and replaced_at is not None and int(replaced_at) < second)
+    else:
+        not_modified = False
+    response = Response(status=304) if not_modified else Response(jpeg, mimetype='image/jpeg')
+    response.set_etag(etag)
+    response.last_modified = timestamp
+    response.cache_control.no_cache = True
+    return response
 
-video_stream = VideoStream()
 
 @app.route('/')
 def index():
-    return render_template('index.html')
+    return Response(INDEX_HTML, mimetype='text/html')
 
 @app.route('/start_stream', methods=['POST'])
 def start_stream():
@@ -220,587 +1344,114 @@ def start_stream():
     if not source:
         return jsonify({'success': False, 'message': 'Video source is required'})
     
-    success, message = video_stream.start_stream(source)
-    return jsonify({'success': success, 'message': message})
+    stream, error = get_or_new_stream(data.get('camera'))
+    if stream is None:
+        return jsonify({'success': False, 'message': error})
+    
+    passthrough = bool(data.get('passthrough'))
+    success, message = stream.start_stream(source, passthrough=passthrough)
+    if success:
+        # New cameras are only registered once their source is open
+        registered = add_stream(stream)
+        if registered is not stream:
+            stream.stop_stream()
+            success = False
+            message = f'Camera limit reached ({MAX_CAMERAS})' if registered is None else 'Stream is already running'
+    return jsonify({'success': success, 'message': message, 'passthrough': passthrough})
 
 @app.route('/stop_stream', methods=['POST'])
 def stop_stream():
-    video_stream.stop_stream()
+    data = request.get_json(silent=True) or {}
+    stream = get_stream(data.get('camera'))
+    if stream is None:
+        return jsonify({'success': False, 'message': 'Unknown camera'})
+    stream.stop_stream()
     return jsonify({'success': True, 'message': 'Stream stopped'})
 
 @app.route('/status')
 def status():
+    stream = get_stream(request.args.get('camera')) or video_stream
     return jsonify({
-        'is_running': video_stream.is_running,
-        'status': video_stream.status,
-        'fps': round(video_stream.current_fps, 2)
+        'is_running': stream.is_running,
+        'status': stream.status,
+        'fps': round(stream.current_fps, 2),
+        'passthrough': stream.passthrough,
+        'cameras': {name: {'is_running': s.is_running, 'fps': round(s.current_fps, 2),
+                           'qos_level': s.qos.level}
+                    for name, s in list(streams.items())},
+        'inference_workers': inference_pool.workers if inference_pool else 0,
+        'startup': STARTUP_TIMINGS
     })
 
 @app.route('/video_feed')
 def video_feed():
-    return Response(video_stream.generate_frames(),
+    stream = get_stream(request.args.get('camera'))
+    if stream is None:
+        return jsonify({'success': False, 'message': 'Unknown camera'}), 404
+    return Response(stream.generate_frames(),
                    mimetype='multipart/x-mixed-replace; boundary=frame')
 
-if __name__ == "__main__":
-    # Create templates directory if it doesn't exist
-    try:
-        os.makedirs('templates', exist_ok=True)
-    except:
-        pass  # Ignore errors in production
-    
-    # HTML content - will be served directly or from file
-    html_content = '''<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Smart Security - Live Camera Monitoring</title>
-    <link href="https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700&display=swap" rel="stylesheet">
-    <style>
-        :root {
-            --background: 224 71% 4%;
-            --foreground: 213 31% 91%;
-            --muted: 223 47% 11%;
-            --muted-foreground: 215.4 16.3% 56.9%;
-            --popover: 224 71% 4%;
-            --popover-foreground: 215 20.2% 65.1%;
-            --border: 216 34% 17%;
-            --input: 216 34% 17%;
-            --card: 224 71% 4%;
-            --card-foreground: 213 31% 91%;
-            --primary: 210 40% 98%;
-            --primary-foreground: 222.2 47.4% 1.2%;
-            --secondary: 222.2 47.4% 11.2%;
-            --secondary-foreground: 210 40% 98%;
-            --accent: 216 34% 17%;
-            --accent-foreground: 210 40% 98%;
-            --destructive: 0 63% 31%;
-            --destructive-foreground: 210 40% 98%;
-            --ring: 216 34% 17%;
-            --radius: 0.5rem;
-        }
-        
-        * {
-            margin: 0;
-            padding: 0;
-            box-sizing: border-box;
-        }
-        
-        body {
-            font-family: 'Inter', -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;
-            background-color: hsl(var(--background));
-            min-height: 100vh;
-            padding: 0;
-            color: hsl(var(--foreground));
-            overflow-x: hidden;
-            line-height: 1.5;
-        }
-        
-        .container {
-            max-width: 1400px;
-            margin: 0 auto;
-            padding: 24px;
-        }
-        
-        /* Header */
-        .header {
-            background-color: hsl(var(--card));
-            border: 1px solid hsl(var(--border));
-            border-radius: var(--radius);
-            padding: 32px;
-            margin-bottom: 24px;
-            text-align: center;
-        }
-        
-        .header-content {
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            gap: 16px;
-            flex-wrap: wrap;
-        }
-        
-        .logo {
-            font-size: 48px;
-        }
-        
-        h1 {
-            font-size: 2.25rem;
-            font-weight: 700;
-            color: hsl(var(--foreground));
-            letter-spacing: -0.025em;
-            margin: 0;
-        }
-        
-        .subtitle {
-            color: hsl(var(--muted-foreground));
-            font-size: 0.875rem;
-            font-weight: 400;
-            margin-top: 4px;
-        }
-        
-        /* Control Panel */
-        .control-panel {
-            background-color: hsl(var(--card));
-            border: 1px solid hsl(var(--border));
-            border-radius: var(--radius);
-            padding: 24px;
-            margin-bottom: 24px;
-        }
-        
-        /* Tabs */
-        .tabs {
-            display: inline-flex;
-            height: 40px;
-            align-items: center;
-            justify-content: center;
-            border-radius: var(--radius);
-            background-color: hsl(var(--muted));
-            padding: 4px;
-            margin-bottom: 24px;
-            width: 100%;
-        }
-        
-        .tab {
-            display: inline-flex;
-            align-items: center;
-            justify-content: center;
-            white-space: nowrap;
-            border-radius: calc(var(--radius) - 4px);
-            padding: 6px 12px;
-            font-size: 0.875rem;
-            font-weight: 500;
-            background: transparent;
-            color: hsl(var(--muted-foreground));
-            border: none;
-            cursor: pointer;
-            transition: all 0.2s;
-            flex: 1;
-        }
-        
-        .tab:hover {
-            color: hsl(var(--foreground));
-        }
-        
-        .tab.active {
-            background-color: hsl(var(--background));
-            color: hsl(var(--foreground));
-            box-shadow: 0 1px 3px 0 rgba(0, 0, 0, 0.1), 0 1px 2px -1px rgba(0, 0, 0, 0.1);
-        }
-        
-        .tab-content {
-            display: none;
-        }
-        
-        .tab-content.active {
-            display: block;
-            animation: fadeIn 0.3s ease;
-        }
-        
-        @keyframes fadeIn {
-            from { opacity: 0; }
-            to { opacity: 1; }
-        }
-        
-        .info-box {
-            background-color: hsl(var(--muted));
-            border: 1px solid hsl(var(--border));
-            color: hsl(var(--foreground));
-            padding: 12px 16px;
-            border-radius: var(--radius);
-            margin-bottom: 24px;
-            display: flex;
-            align-items: center;
-            gap: 12px;
-            font-size: 0.875rem;
-        }
-        
-        .control-section {
-            margin-bottom: 20px;
-        }
-        
-        .control-section label {
-            display: block;
-            margin-bottom: 8px;
-            font-weight: 500;
-            color: hsl(var(--foreground));
-            font-size: 0.875rem;
-        }
-        
-        .input-group {
-            display: flex;
-            gap: 12px;
-            align-items: stretch;
-        }
-        
-        input[type="text"] {
-            flex: 1;
-            height: 40px;
-            padding: 8px 12px;
-            font-size: 0.875rem;
-            background-color: hsl(var(--background));
-            border: 1px solid hsl(var(--input));
-            border-radius: var(--radius);
-            color: hsl(var(--foreground));
-            transition: all 0.2s;
-            font-family: 'Inter', sans-serif;
-        }
-        
-        input[type="text"]:focus {
-            outline: none;
-            border-color: hsl(var(--ring));
-            box-shadow: 0 0 0 2px hsl(var(--ring) / 0.2);
-        }
-        
-        input[type="text"]::placeholder {
-            color: hsl(var(--muted-foreground));
-        }
-        
-        input[type="text"]:disabled {
-            opacity: 0.5;
-            cursor: not-allowed;
-        }
-        
-        /* Buttons */
-        .btn {
-            display: inline-flex;
-            align-items: center;
-            justify-content: center;
-            white-space: nowrap;
-            border-radius: var(--radius);
-            font-size: 0.875rem;
-            font-weight: 500;
-            height: 40px;
-            padding: 8px 16px;
-            border: none;
-            cursor: pointer;
-            transition: all 0.2s;
-            font-family: 'Inter', sans-serif;
-            gap: 8px;
-        }
-        
-        .btn-start {
-            background-color: hsl(var(--primary));
-            color: hsl(var(--primary-foreground));
-        }
-        
-        .btn-start:hover:not(:disabled) {
-            background-color: hsl(var(--primary) / 0.9);
-        }
-        
-        .btn-stop {
-            background-color: hsl(var(--destructive));
-            color: hsl(var(--destructive-foreground));
-        }
-        
-        .btn-stop:hover:not(:disabled) {
-            background-color: hsl(var(--destructive) / 0.9);
-        }
-        
-        .btn-demo {
-            background-color: hsl(var(--secondary));
-            color: hsl(var(--secondary-foreground));
-        }
-        
-        .btn-demo:hover:not(:disabled) {
-            background-color: hsl(var(--secondary) / 0.8);
-        }
-        
-        .btn:disabled {
-            opacity: 0.5;
-            cursor: not-allowed;
-        }
-        
-        .btn-group {
-            display: flex;
-            justify-content: center;
-            gap: 12px;
-            margin-top: 20px;
-        }
-        
-        /* Status Bar */
-        .status-bar {
-            display: flex;
-            justify-content: space-between;
-            align-items: center;
-            padding: 16px 24px;
-            background-color: hsl(var(--card));
-            border: 1px solid hsl(var(--border));
-            border-radius: var(--radius);
-            margin-bottom: 24px;
-        }
-        
-        .status-item {
-            display: flex;
-            align-items: center;
-            gap: 12px;
-            font-weight: 500;
-            font-size: 0.875rem;
-        }
-        
-        .status-indicator {
-            width: 10px;
-            height: 10px;
-            border-radius: 9999px;
-            background: hsl(var(--muted-foreground));
-        }
-        
-        .status-indicator.active {
-            background: #22c55e;
-            animation: pulse 2s cubic-bezier(0.4, 0, 0.6, 1) infinite;
-        }
-        
-        @keyframes pulse {
-            0%, 100% {
-                opacity: 1;
-            }
-            50% {
-                opacity: 0.5;
-            }
-        }
-        
-        /* Video Container */
-        .video-container {
-            background-color: hsl(var(--card));
-            border: 1px solid hsl(var(--border));
-            border-radius: var(--radius);
-            padding: 24px;
-            display: flex;
-            justify-content: center;
-            align-items: center;
-            min-height: 600px;
-            position: relative;
-            overflow: hidden;
-        }
-        
-        .video-container.streaming {
-            border-color: hsl(var(--primary));
-        }
-        
-        #videoFeed {
-            max-width: 100%;
-            max-height: 700px;
-            border-radius: calc(var(--radius) - 4px);
-            display: none;
-        }
-        
-        .placeholder {
-            text-align: center;
-            color: hsl(var(--muted-foreground));
-            padding: 48px 32px;
-        }
-        
-        .placeholder-icon {
-            font-size: 64px;
-            margin-bottom: 16px;
-            opacity: 0.5;
-        }
-        
-        .placeholder-text {
-            font-size: 1.25rem;
-            font-weight: 600;
-            margin-bottom: 8px;
-            color: hsl(var(--foreground));
-        }
-        
-        .placeholder-subtext {
-            font-size: 0.875rem;
-        }
-        
-        /* Messages */
-        .message {
-            padding: 12px 16px;
-            margin: 16px 0;
-            border-radius: var(--radius);
-            display: none;
-            font-weight: 500;
-            font-size: 0.875rem;
-            border: 1px solid;
-        }
-        
-        .message.success {
-            background-color: hsl(142.1 76.2% 36.3% / 0.1);
-            color: #22c55e;
-            border-color: hsl(142.1 76.2% 36.3% / 0.3);
-        }
-        
-        .message.error {
-            background-color: hsl(var(--destructive) / 0.1);
-            color: #ef4444;
-            border-color: hsl(var(--destructive) / 0.3);
-        }
-        
-        /* Responsive */
-        @media (max-width: 768px) {
-            h1 {
-                font-size: 1.875rem;
-            }
-            .logo {
-                font-size: 36px;
-            }
-            .input-group {
-                flex-direction: column;
-            }
-            .status-bar {
-                flex-direction: column;
-                gap: 12px;
-            }
-            .btn-group {
-                flex-direction: column;
-            }
-            .btn {
-                width: 100%;
-            }
-        }
-    </style>
-</head>
-<body>
-    <div class="container">
-        <div class="header">
-            <div class="header-content">
-                <div class="logo">🎥</div>
-                <div>
-                    <h1>Smart Security</h1>
-                    <p class="subtitle">Live Camera Monitoring System</p>
-                </div>
-            </div>
-        </div>
-        
-        <div class="control-panel">
-            <div class="info-box">
-                <span>📡</span>
-                <span>Enter your RTSP camera URL to start streaming</span>
-            </div>
-            <div class="control-section">
-                <label for="rtspUrl">RTSP URL:</label>
-                <div class="input-group">
-                    <input type="text" id="rtspUrl" placeholder="rtsp://username:password@ip:port/stream" value="rtsp://127.0.0.1:8554/camera">
-                    <button class="btn btn-start" id="startBtn" onclick="startStream()">▶ Start Stream</button>
-                    <button class="btn btn-stop" id="stopBtn" onclick="stopStream()" disabled>⏹ Stop</button>
-                </div>
-            </div>
-        </div>
-        
-        <div id="message" class="message"></div>
-        
-        <div class="status-bar">
-            <div class="status-item">
-                <div class="status-indicator" id="statusIndicator"></div>
-                <span id="statusText">Status: Ready</span>
-            </div>
-            <div class="status-item">
-                <span id="fpsText">FPS: 0</span>
-            </div>
-        </div>
-        
-        <div class="video-container" id="videoContainer">
-            <img id="videoFeed" src="" style="display: none;">
-            <div id="placeholder" class="placeholder">
-                <div class="placeholder-icon">🎬</div>
-                <div class="placeholder-text">No Active Stream</div>
-                <div class="placeholder-subtext">Enter an RTSP URL above and click start to begin streaming</div>
-            </div>
-        </div>
-    </div>
-    
-    <script>
-        let statusInterval;
-        
-        function showMessage(text, type) {
-            const msg = document.getElementById('message');
-            msg.textContent = text;
-            msg.className = 'message ' + type;
-            msg.style.display = 'block';
-            setTimeout(() => msg.style.display = 'none', 5000);
-        }
-        
-        async function startStream() {
-            const source = document.getElementById('rtspUrl').value.trim();
-            
-            if (!source) {
-                showMessage('Please enter a valid RTSP URL', 'error');
-                return;
-            }
-            
-            const response = await fetch('/start_stream', {
-                method: 'POST',
-                headers: {'Content-Type': 'application/json'},
-                body: JSON.stringify({source: source})
-            });
-            
-            const data = await response.json();
-            if (data.success) {
-                showMessage(data.message, 'success');
-                document.getElementById('videoContainer').classList.add('streaming');
-                document.getElementById('videoFeed').src = '/video_feed?' + new Date().getTime();
-                document.getElementById('videoFeed').style.display = 'block';
-                document.getElementById('placeholder').style.display = 'none';
-                document.getElementById('startBtn').disabled = true;
-                document.getElementById('stopBtn').disabled = false;
-                document.getElementById('rtspUrl').disabled = true;
-                
-                startStatusUpdates();
-            } else {
-                showMessage(data.message, 'error');
-            }
-        }
-        
-        async function stopStream() {
-            const response = await fetch('/stop_stream', {method: 'POST'});
-            const data = await response.json();
-            
-            showMessage(data.message, 'success');
-            document.getElementById('videoContainer').classList.remove('streaming');
-            document.getElementById('videoFeed').src = '';
-            document.getElementById('videoFeed').style.display = 'none';
-            document.getElementById('placeholder').style.display = 'block';
-            document.getElementById('startBtn').disabled = false;
-            document.getElementById('stopBtn').disabled = true;
-            document.getElementById('rtspUrl').disabled = false;
-            
-            stopStatusUpdates();
-        }
-        
-        function startStatusUpdates() {
-            statusInterval = setInterval(async () => {
-                try {
-                    const response = await fetch('/status');
-                    const data = await response.json();
-                    
-                    document.getElementById('statusText').textContent = 'Status: ' + data.status;
-                    document.getElementById('fpsText').textContent = 'FPS: ' + data.fps;
-                    
-                    const indicator = document.getElementById('statusIndicator');
-                    if (data.is_running) {
-                        indicator.classList.add('active');
-                    } else {
-                        indicator.classList.remove('active');
-                    }
-                } catch (e) {
-                    console.error('Status update failed:', e);
-                }
-            }, 1000);
-        }
-        
-        function stopStatusUpdates() {
-            if (statusInterval) {
-                clearInterval(statusInterval);
-            }
-            document.getElementById('statusText').textContent = 'Status: Stopped';
-            document.getElementById('fpsText').textContent = 'FPS: 0';
-            document.getElementById('statusIndicator').classList.remove('active');
-        }
-    </script>
-</body>
-</html>'''
+@app.route('/config', methods=['GET', 'PATCH'])
+def config():
+    if request.method == 'GET' and request.args.get('camera') is None:
+        return jsonify({name: s.config.to_dict() for name, s in list(streams.items())})
     
-    # Try to write template file (may fail in production)
-    try:
-        with open('templates/index.html', 'w') as f:
-            f.write(html_content)
-    except:
-        pass  # Ignore write errors in production environments
+    if request.method == 'GET':
+        stream = get_stream(request.args.get('camera'))
+        if stream is None:
+            return jsonify({'success': False, 'message': 'Unknown camera'}), 404
+        return jsonify(stream.config.to_dict())
+    
+    stream, error = get_or_new_stream(request.args.get('camera'))
+    if stream is None:
+        return jsonify({'success': False, 'message': error}), 400
+    changes = request.get_json(silent=True)
+    if stream.name not in streams:
+        # Configuring a camera ahead of its first start: register it only if the config is valid
+        _, errors = stream.config.updated(changes)
+        if errors:
+            return jsonify({'success': False, 'message': 'Invalid config', 'errors': errors}), 400
+        stream = add_stream(stream)
+        if stream is None:
+            return jsonify({'success': False, 'message': f'Camera limit reached ({MAX_CAMERAS})'}), 400
     
+    new_config, errors, persisted = apply_config(stream, changes)
+    if new_config is None:
+        return jsonify({'success': False, 'message': 'Invalid config', 'errors': errors}), 400
+    return jsonify({'success': True, 'persisted': persisted, 'config': new_config.to_dict()})
+
+@app.route('/qos')
+def qos():
+    return jsonify({name: dict(s.qos.to_dict(), budget_ms=s.config.latency_budget_ms,
+                               priority=s.config.priority, is_running=s.is_running)
+                    for name, s in list(streams.items())})
+
+@app.route('/detections')
+def detections():
+    stream = get_stream(request.args.get('camera'))
+    if stream is None:
+        return jsonify({'success': False, 'message': 'Unknown camera'}), 404
+    return Response(stream.generate_detections(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/snapshot/<camera>.jpg')
+def snapshot(camera):
+    stream = get_stream(camera)
+    if stream is None:
+        return jsonify({'success': False, 'message': 'Unknown camera'}), 404
+    snap = stream.snapshot()
+    if snap is None:
+        return jsonify({'success': False, 'message': 'No frame available yet'}), 503
+    return jpeg_response(*snap)
+
+@app.route('/mosaic.jpg')
+def mosaic():
+    return jpeg_response(*mosaic_builder.get(dict(streams)))
+
+STARTUP_TIMINGS['ready'] = round(time.perf_counter() - _BOOT_START, 3)
+print(f"⏱️ Startup: {STARTUP_TIMINGS}")
+
+if __name__ == "__main__":
     # Get port from environment variable (for deployment) or use default
     port = int(os.environ.get('PORT', 8080))
     
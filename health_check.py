@@ -2,10 +2,24 @@
 """
 Health Check Script
 Use this to verify your deployment is working correctly
+
+Load testing:
+    python3 health_check.py URL --load N [--duration S] [--slow K --slow-rate BYTES_PER_SEC]
+    python3 health_check.py --local --load N        # self-contained: in-process server + local file source
+Opens N concurrent /video_feed clients (K of them reading at a capped rate
+to simulate slow consumers) and reports per-client FPS, inter-frame
+jitter, bytes/sec, time to first frame and the server's /status FPS.
 """
 
-import requests
+import argparse
+import os
+import statistics
 import sys
+import tempfile
+import threading
+import time
+
+import requests
 
 def check_health(url):
     """Check if the application is running"""
@@ -25,19 +39,205 @@ def check_health(url):
         print(f"❌ Could not connect to application: {e}")
         return False
 
-def main():
-    if len(sys.argv) > 1:
-        url = sys.argv[1]
+class MJPEGClient(threading.Thread):
+    """One /video_feed viewer: parses multipart parts and records frame arrival times"""
+
+    def __init__(self, url, duration, read_rate=0, chunk_size=16384):
+        super().__init__(daemon=True)
+        self.url = url
+        self.duration = duration
+        self.read_rate = read_rate  # bytes/sec, 0 = as fast as possible
+        self.chunk_size = chunk_size
+        self.frame_times = []
+        self.bytes_read = 0
+        self.started_at = None
+        self.finished_at = None
+        self.error = None
+
+    def run(self):
+        self.started_at = time.time()
+        deadline = self.started_at + self.duration
+        try:
+            with requests.get(self.url, stream=True, timeout=10) as response:
+                response.raise_for_status()
+                content_type = response.headers.get('Content-Type', '')
+                boundary = content_type.split('boundary=')[-1].strip('"') if 'boundary=' in content_type else 'frame'
+                self._consume(response, b'--' + boundary.encode(), deadline)
+        except requests.exceptions.RequestException as e:
+            self.error = str(e)
+        self.finished_at = time.time()
+
+    def _consume(self, response, delimiter, deadline):
+        buf = bytearray()
+        for chunk in response.iter_content(chunk_size=self.chunk_size):
+            now = time.time()
+            self.bytes_read += len(chunk)
+            buf += chunk
+            self._parse_parts(buf, delimiter, now)
+            if now >= deadline:
+                break
+            if self.read_rate:
+                time.sleep(len(chunk) / self.read_rate)
+
+    def _parse_parts(self, buf, delimiter, now):
+        """Consume every complete part in buf (Content-Length if sent, else next boundary)"""
+        while True:
+            start = buf.find(delimiter)
+            if start < 0:
+                return
+            header_end = buf.find(b'\r\n\r\n', start)
+            if header_end < 0:
+                return
+            body_start = header_end + 4
+            length = None
+            for line in bytes(buf[start + len(delimiter):header_end]).split(b'\r\n'):
+                name, _, value = line.partition(b':')
+                if name.strip().lower() == b'content-length':
+                    length = int(value.strip())
+            if length is not None:
+                if len(buf) < body_start + length:
+                    return
+                end = body_start + length
+            else:
+                end = buf.find(delimiter, body_start)
+                if end < 0:
+                    return
+            self.frame_times.append(now)
+            del buf[:end]
+
+    def stats(self):
+        elapsed = (self.finished_at or time.time()) - self.started_at
+        intervals = [b - a for a, b in zip(self.frame_times, self.frame_times[1:])]
+        span = self.frame_times[-1] - self.frame_times[0] if len(self.frame_times) > 1 else 0
+        return {
+            'frames': len(self.frame_times),
+            'fps': (len(self.frame_times) - 1) / span if span > 0 else 0,
+            'jitter_ms': statistics.pstdev(intervals) * 1000 if len(intervals) > 1 else 0,
+            'bytes_per_sec': self.bytes_read / elapsed if elapsed > 0 else 0,
+            'ttff_ms': (self.frame_times[0] - self.started_at) * 1000 if self.frame_times else None,
+            'error': self.error,
+        }
+
+def sample_status(url, camera, stop_event, samples, interval=1.0):
+    """Poll /status while the load test runs and collect the server-side FPS"""
+    while not stop_event.is_set():
+        try:
+            data = requests.get(f"{url}/status", params={'camera': camera} if camera else None, timeout=5).json()
+            samples.append(data.get('fps', 0))
+        except (requests.exceptions.RequestException, ValueError):
+            pass
+        stop_event.wait(interval)
+
+def run_load_test(url, clients, duration, slow=0, slow_rate=50000, camera=None):
+    """Open `clients` concurrent viewers for `duration` seconds and print a report"""
+    feed_url = f"{url}/video_feed" + (f"?camera={camera}" if camera else "")
+    print(f"🔥 Load test: {clients} clients ({slow} slow @ {slow_rate} B/s) for {duration}s on {feed_url}")
+    print("=" * 78)
+
+    viewers = [MJPEGClient(feed_url, duration, read_rate=slow_rate if i < slow else 0)
+               for i in range(clients)]
+    stop_event = threading.Event()
+    server_fps = []
+    sampler = threading.Thread(target=sample_status, args=(url, camera, stop_event, server_fps), daemon=True)
+    sampler.start()
+    for viewer in viewers:
+        viewer.start()
+    for viewer in viewers:
+        viewer.join(duration + 15)
+    stop_event.set()
+    sampler.join(5)
+
+    print(f"{'client':<8}{'kind':<6}{'frames':>8}{'fps':>8}{'jitter ms':>11}{'KB/s':>10}{'TTFF ms':>10}  error")
+    results = []
+    for i, viewer in enumerate(viewers):
+        s = viewer.stats()
+        results.append(s)
+        ttff = f"{s['ttff_ms']:.0f}" if s['ttff_ms'] is not None else "-"
+        print(f"{i:<8}{'slow' if viewer.read_rate else 'fast':<6}{s['frames']:>8}{s['fps']:>8.2f}"
+              f"{s['jitter_ms']:>11.1f}{s['bytes_per_sec'] / 1024:>10.1f}{ttff:>10}  {s['error'] or ''}")
+
+    print("=" * 78)
+    ok = [s for s in results if s['frames'] > 0]
+    if ok:
+        print(f"📊 Clients receiving frames: {len(ok)}/{len(results)}")
+        print(f"   Mean client FPS: {statistics.mean(s['fps'] for s in ok):.2f}")
+        print(f"   Mean jitter: {statistics.mean(s['jitter_ms'] for s in ok):.1f} ms")
+        print(f"   Total throughput: {sum(s['bytes_per_sec'] for s in results) / 1024:.1f} KB/s")
+        print(f"   Mean TTFF: {statistics.mean(s['ttff_ms'] for s in ok):.0f} ms")
     else:
-        url = "http://127.0.0.1:8080"
-    
+        print("❌ No client received a frame")
+    if server_fps:
+        print(f"   Server /status FPS: mean {statistics.mean(server_fps):.2f}, min {min(server_fps):.2f}")
+    return len(ok) == len(results)
+
+def start_local_server():
+    """Serve detecciones.app in-process on a free port; returns (url, server)"""
+    import logging
+    from werkzeug.serving import make_server
+    import detecciones
+
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    server = make_server('127.0.0.1', 0, detecciones.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", server
+
+def make_test_video(path, seconds=10, fps=25, size=(1280, 720)):
+    """Write a synthetic clip so the load test needs no camera or sample file"""
+    import cv2
+    import numpy as np
+
+    width, height = size
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), fps, size)
+    for i in range(seconds * fps):
+        frame = np.full((height, width, 3), (i * 3) % 255, dtype=np.uint8)
+        cv2.rectangle(frame, ((i * 8) % width, height // 3), ((i * 8) % width + 120, height // 3 + 120), (0, 200, 255), -1)
+        cv2.putText(frame, f"frame {i}", (40, height - 40), cv2.FONT_HERSHEY_SIMPLEX, 1.5, (255, 255, 255), 3)
+        writer.write(frame)
+    writer.release()
+
+def main():
+    parser = argparse.ArgumentParser(description="Health check and MJPEG load tester")
+    parser.add_argument('url', nargs='?', default="http://127.0.0.1:8080")
+    parser.add_argument('--load', type=int, default=0, metavar='N', help="open N concurrent /video_feed clients")
+    parser.add_argument('--duration', type=float, default=15, help="load test duration in seconds")
+    parser.add_argument('--slow', type=int, default=0, metavar='K', help="how many clients read at --slow-rate")
+    parser.add_argument('--slow-rate', type=int, default=50000, help="slow client read speed in bytes/sec")
+    parser.add_argument('--camera', help="camera name (default camera if omitted)")
+    parser.add_argument('--source', help="start the stream from this video file/URL before the load test")
+    parser.add_argument('--local', action='store_true',
+                        help="run the app in-process against a local file (synthetic clip if no --source)")
+    args = parser.parse_args()
+
+    url = args.url
+    tmp_dir = None
+    if args.local:
+        url, _server = start_local_server()
+        if not args.source:
+            tmp_dir = tempfile.TemporaryDirectory()
+            args.source = os.path.join(tmp_dir.name, 'loadtest.avi')
+            make_test_video(args.source)
+
     print(f"🔍 Checking health of: {url}")
     print("=" * 50)
-    
-    if check_health(url):
-        sys.exit(0)
-    else:
+
+    if not check_health(url):
         sys.exit(1)
 
+    if args.source:
+        payload = {'source': args.source}
+        if args.camera:
+            payload['camera'] = args.camera
+        data = requests.post(f"{url}/start_stream", json=payload, timeout=60).json()
+        print(f"{'✅' if data.get('success') else '⚠️'} Start stream: {data.get('message')}")
+
+    if args.load:
+        ok = run_load_test(url, args.load, args.duration, args.slow, args.slow_rate, args.camera)
+        if args.local:
+            requests.post(f"{url}/stop_stream", json={'camera': args.camera} if args.camera else {}, timeout=10)
+        if tmp_dir:
+            tmp_dir.cleanup()
+        sys.exit(0 if ok else 1)
+    sys.exit(0)
+
 if __name__ == "__main__":
     main()
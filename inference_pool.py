@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Inference Worker Pool
+Runs YOLO inference in separate processes so decoding, drawing and
+serving are not serialized with the models under the GIL.
+
+Frames are handed over through a shared-memory ring of preallocated
+frame slots; only the slot index goes through the task queue and only
+the small detection arrays come back. Capture can decode straight into
+a reserved slot (acquire_slot/slot_view/submit_slot), so a frame is
+never copied on its way to the workers.
+"""
+
+import os
+import queue
+import threading
+import time
+import multiprocessing as mp
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+EMPTY_DETECTIONS = np.empty((0, 6), dtype=np.float32)
+
+
+def _slot_frame(ring, slot, height, width):
+    """Contiguous (height, width, 3) view of the start of a slot"""
+    return ring[slot, :height * width * 3].reshape(height, width, 3)
+
+
+def _worker_main(shm_name, ring_shape, model_paths, tasks, results):
+    """Worker process: load the models once, report ready/error, then serve tasks until a None sentinel"""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    frames = np.ndarray(ring_shape, dtype=np.uint8, buffer=shm.buf)
+    try:
+        try:
+            import torch
+            from ultralytics import YOLO
+
+            device = "cuda" if torch.cuda.is_available() else "cpu"
+            model_arms = YOLO(model_paths[0]).to(device)
+            model_helmet = YOLO(model_paths[1]).to(device)
+        except Exception as e:
+            results.put(('error', os.getpid(), f"{type(e).__name__}: {e}"))
+            return
+        results.put(('ready', os.getpid(), device))
+        print(f"🧠 Inference worker {os.getpid()} ready on {device}")
+
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            slot, seq, height, width, imgsz, conf = task
+            frame = _slot_frame(frames, slot, height, width)
+            try:
+                result_arms = model_arms.predict(source=frame, imgsz=imgsz, conf=conf, verbose=False)[0]
+                result_helmet = model_helmet.predict(source=frame, imgsz=imgsz, conf=conf, verbose=False)[0]
+                results.put((slot, seq,
+                             result_arms.boxes.data.cpu().numpy(), result_arms.names,
+                             result_helmet.boxes.data.cpu().numpy(), result_helmet.names))
+            except Exception as e:
+                print(f"Detection error in worker {os.getpid()}: {e}")
+                results.put((slot, seq, EMPTY_DETECTIONS, {}, EMPTY_DETECTIONS, {}))
+    finally:
+        del frames
+        shm.close()
+
+
+class InferencePool:
+    """Pool of inference processes fed through a shared-memory frame ring.
+
+    Usage from a capture thread:
+        slot = pool.submit(frame, seq, imgsz, conf, reply_queue)   # copies; None if the ring is full
+    or, zero-copy:
+        slot = pool.acquire_slot()
+        ok, frame = cap.read(pool.slot_view(slot, height, width))
+        pool.submit_slot(slot, frame, seq, imgsz, conf, reply_queue)
+    then:
+        slot, seq, frame_view, dets_arms, names_arms, dets_helmet, names_helmet = reply_queue.get()
+        ... draw on frame_view, encode ...
+        pool.release(slot)
+
+    The constructor blocks until every worker has loaded its models and raises
+    RuntimeError if one fails to; healthy() turns False once a worker dies.
+    """
+
+    def __init__(self, workers, model_paths, slots=None, max_frame_size=(1920, 1080), ready_timeout=120):
+        self.workers = workers
+        self.slots = slots or workers * 2
+        self.max_width, self.max_height = max_frame_size
+        ring_shape = (self.slots, self.max_height * self.max_width * 3)
+
+        self._shm = shared_memory.SharedMemory(create=True, size=int(np.prod(ring_shape)))
+        self.frames = np.ndarray(ring_shape, dtype=np.uint8, buffer=self._shm.buf)
+        self._shapes = [None] * self.slots
+        self._free = queue.Queue()
+        for slot in range(self.slots):
+            self._free.put(slot)
+        self._replies = [None] * self.slots
+        self._replies_lock = threading.Lock()
+
+        self._closed = False
+        self._dispatcher = None
+        ctx = mp.get_context('spawn')
+        self._tasks = ctx.Queue()
+        self._results = ctx.Queue()
+        self._procs = [ctx.Process(target=_worker_main, daemon=True,
+                                   args=(self._shm.name, ring_shape, model_paths, self._tasks, self._results))
+                       for _ in range(workers)]
+        for proc in self._procs:
+            proc.start()
+        try:
+            self._wait_ready(ready_timeout)
+        except Exception:
+            self.close()
+            raise
+
+        self._dispatcher = threading.Thread(target=self._dispatch_results, daemon=True)
+        self._dispatcher.start()
+
+    def _wait_ready(self, timeout):
+        """Block until every worker reports its models loaded; raise RuntimeError otherwise"""
+        deadline = time.time() + timeout
+        pending = len(self._procs)
+        while pending:
+            try:
+                status, pid, detail = self._results.get(timeout=1.0)
+            except queue.Empty:
+                if not self.healthy():
+                    raise RuntimeError("Inference worker exited while loading models")
+                if time.time() > deadline:
+                    raise RuntimeError(f"Inference workers not ready after {timeout}s")
+                continue
+            if status == 'error':
+                raise RuntimeError(f"Inference worker {pid} failed to load models: {detail}")
+            pending -= 1
+
+    def healthy(self):
+        """True while the pool is open and every worker process is alive"""
+        return not self._closed and all(proc.is_alive() for proc in self._procs)
+
+    def submit(self, frame, seq, imgsz, conf, reply_queue, timeout=1.0):
+        """Copy frame into a free slot and queue it for inference. Returns the slot or None."""
+        slot = self.acquire_slot(timeout)
+        if slot is not None:
+            self.submit_slot(slot, frame, seq, imgsz, conf, reply_queue)
+        return slot
+
+    def acquire_slot(self, timeout=1.0):
+        """Reserve a free slot to fill in place (see slot_view). Returns the slot or None."""
+        try:
+            return self._free.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def slot_view(self, slot, height, width):
+        """Writable (height, width, 3) view of a reserved slot to decode into, or None if it does not fit"""
+        if width > self.max_width or height > self.max_height:
+            return None
+        return _slot_frame(self.frames, slot, height, width)
+
+    def submit_slot(self, slot, frame, seq, imgsz, conf, reply_queue):
+        """Queue a reserved slot for inference. frame is normally its slot_view() filled in
+        place; any other array is copied in (and downscaled if larger than a slot)."""
+        height, width = frame.shape[:2]
+        if width > self.max_width or height > self.max_height:
+            # Frames larger than a slot are downscaled to fit
+            scale = min(self.max_width / width, self.max_height / height)
+            width, height = int(width * scale), int(height * scale)
+            frame = cv2.resize(frame, (width, height))
+        view = _slot_frame(self.frames, slot, height, width)
+        if frame.ctypes.data != view.ctypes.data:
+            view[:] = frame
+
+        self._shapes[slot] = (height, width)
+        with self._replies_lock:
+            self._replies[slot] = reply_queue
+        self._tasks.put((slot, seq, height, width, imgsz, conf))
+
+    def frame_view(self, slot):
+        """Frame stored in slot (a view into shared memory, valid until release)"""
+        height, width = self._shapes[slot]
+        return _slot_frame(self.frames, slot, height, width)
+
+    def release(self, slot):
+        """Return a slot whose result has been delivered to the free list"""
+        self._free.put(slot)
+
+    def abandon(self, slot):
+        """Give up on an in-flight slot; it is released by the pool when its result arrives.
+
+        Returns False if the result was already delivered to the reply queue, in
+        which case the caller still owns the slot and must release() it.
+        """
+        with self._replies_lock:
+            if self._replies[slot] is None:
+                return False
+            self._replies[slot] = None
+            return True
+
+    def _dispatch_results(self):
+        while not self._closed:
+            try:
+                slot, seq, dets_arms, names_arms, dets_helmet, names_helmet = self._results.get(timeout=1.0)
+            except (queue.Empty, EOFError, OSError):
+                continue
+            with self._replies_lock:
+                reply_queue = self._replies[slot]
+                self._replies[slot] = None
+                if reply_queue is not None:
+                    reply_queue.put((slot, seq, self.frame_view(slot),
+                                     dets_arms, names_arms, dets_helmet, names_helmet))
+            if reply_queue is None:
+                self._free.put(slot)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        for _ in self._procs:
+            self._tasks.put(None)
+        for proc in self._procs:
+            proc.join(timeout=5)
+            if proc.is_alive():
+                proc.terminate()
+        if self._dispatcher:
+            self._dispatcher.join(timeout=2)
+        del self.frames
+        self._shm.close()
+        self._shm.unlink()